@@ -1,14 +1,142 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import time
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import pandas as pd
-from service import load_games, load_streaming_data, add_package_coverage, get_subscription_details, filter_games
-from streaming_optimizer import preprocess_data, optimize_streaming_packages
+from service import load_games, add_package_coverage, get_subscription_details, filter_games
+from streaming_optimizer import (preprocess_data, optimize_streaming_packages, check_limits, request_deadline,
+                                 GRANULARITY_SPANS, SOLVERS)
+from presolve import optimize_with_presolve
+from catalog import StreamingCatalog
+from game_index import GameIndex
+from datastore import DataStore, STORE_DIR, store_is_current
+from solution_cache import SolutionCache, InFlight, problem_key
+from budget import BudgetModel, BudgetModelStore
+from jobs import JobManager, QueueFull, FINAL_STATES
+from session import OptimizationSession, SessionStore
+from batch import run_batch
+from plans import load_plans
+from encoding import (RESPONSE_FORMATS, DATE_FORMATS, ENCODINGS, COMPRESS_MIN_BYTES, compact_response, dumps,
+                      stream_lines, compress, compress_stream)
+from tracing import Trace, Metrics, SamplingProfiler, SIZE_BUCKETS, span, annotate
 
 app = Flask(__name__)
 CORS(app)
 
+# Map the compiled data store (`python datastore.py`) if it is up to date, else read the CSV files
+store = DataStore(STORE_DIR) if store_is_current() else None
+
 # Load the games data
-games_df = load_games()
+games_df = store.tables['games'] if store else load_games()
+
+# Load streaming offers and packages once; the catalog reloads itself when the data files or the
+# compiled store change, and maps the store whenever it is up to date
+catalog = StreamingCatalog(store_dir=STORE_DIR)
+
+# Team, substring and date indexes over the games
+game_index = GameIndex(games_df)
+
+# Precomputed plans of single clubs (`python plans.py`), if up to date
+plan_table = load_plans()
+
+# Cache of optimization results; set SOLUTION_CACHE_DIR to keep them across restarts
+solution_cache = SolutionCache(
+    max_bytes=int(os.environ.get('SOLUTION_CACHE_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.environ.get('SOLUTION_CACHE_TTL', 24 * 60 * 60)),
+    directory=os.environ.get('SOLUTION_CACHE_DIR'),
+)
+
+# Optimizations that are running, so identical problems that arrive meanwhile wait for their result
+in_flight = InFlight()
+
+# Built budget models, so moving the budget slider re-solves instead of rebuilding the model
+budget_models = BudgetModelStore(int(os.environ.get('BUDGET_MODELS', 32)))
+
+# Query sessions ("session_id" in the request): a tweaked query reuses the unchanged components of
+# the previous ones and warm starts from the previous solution
+sessions = SessionStore(
+    max_sessions=int(os.environ.get('SESSIONS', 256)),
+    ttl=float(os.environ.get('SESSION_TTL', 30 * 60)),
+)
+
+# Background optimizations (/jobs): a few run at once, a bounded number waits for a worker
+job_manager = JobManager(
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    max_queued=int(os.environ.get('JOB_QUEUE', 16)),
+)
+
+# Most queries in one /optimizeBatch request
+BATCH_MAX_QUERIES = int(os.environ.get('BATCH_MAX_QUERIES', 1000))
+# Request fields that change the model besides the games: queries of a batch only share a session
+# if they agree on all of them
+BATCH_SESSION_FIELDS = ('live_value', 'highlight_value', 'granularity', 'presolve', 'solver', 'warm_start',
+                        'time_limit', 'gap', 'threads')
+
+# Request latencies, stage timings and model sizes for /metrics
+metrics = Metrics()
+
+# Set PROFILE_REQUESTS=1 to allow "profile": true in a request body, which runs the request under
+# the sampling profiler; with PROFILE_DIR set, the collapsed stacks are written there
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS') == '1'
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+def solve_cached(preprocessed_data, granularity, use_presolve, solver='mip', warm_start=False, monitor=None, limits=None,
+                 session=None, deadline=None):
+    """
+    Optimizes the preprocessed problem, reusing the cached result of an identical problem.
+    The deadline of a numeric time limit is passed on to the optimization (see `request_deadline`).
+
+    With a session, the components it has solved already are reused and CBC starts from its
+    previous solution. Unmonitored optimizations of a problem that is being solved already wait
+    for that solve (see `InFlight`).
+
+    Returns:
+        tuple: Optimization results (dict) and whether they came from the cache (bool).
+    """
+    problem = [preprocessed_data[k] for k in ('packages', 'games', 'game_dates', 'C_month', 'C_year', 'P_g')]
+    preferences = preprocessed_data['preferences']
+    key = problem_key(*problem, granularity=granularity, preferences=preferences, presolve=use_presolve, solver=solver,
+                      warm_start=warm_start, limits=sorted(check_limits(limits or {}).items()))
+    component_cache, initial = None, None
+    if session is not None:
+        component_cache, initial = session.solver_state(granularity, use_presolve, solver, warm_start,
+                                                        sorted(check_limits(limits or {}).items()))
+    results = solution_cache.get(key)
+    cached = results is not None
+
+    def solve():
+        optimize = optimize_with_presolve if use_presolve else optimize_streaming_packages
+        solved = optimize(*problem, granularity=granularity, solver=solver, warm_start=warm_start, monitor=monitor,
+                          limits=limits, preferences=preferences, initial=initial, component_cache=component_cache,
+                          deadline=deadline)
+        # Only keep results that are worth reusing (not the ones cut short by a solver limit)
+        if solved['status'] in ('Optimal', 'Heuristic'):
+            solution_cache.put(key, solved)
+        return solved
+
+    if not cached:
+        # A monitored solve can be cancelled, others must not wait for it
+        results, cached = in_flight.run(key, solve) if monitor is None else (solve(), False)
+    if session is not None:
+        session.remember(results)
+    return results, cached
+
+def invalid_dates(*dates):
+    """
+    Returns the given dates that are set but can't be parsed (dates look like '2024-08-01' or
+    '2024-08-01 18:30:00').
+    """
+    invalid = []
+    for value in dates:
+        if not value:
+            continue
+        try:
+            if not isinstance(value, str) or pd.isna(pd.Timestamp(value)):
+                invalid.append(value)
+        except (ValueError, OverflowError):
+            invalid.append(value)
+    return invalid
 
 @app.route("/")
 def hello_world():
@@ -19,32 +147,166 @@ def get_games():
     name = request.args.get('name')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    
-    filtered_games = games_df
-    
-    if name:
-        filtered_games = filtered_games[(filtered_games['team_home'].str.contains(name, case=False)) | 
-                                        (filtered_games['team_away'].str.contains(name, case=False))]
-    
-    if start_date and end_date:
-        filtered_games = filtered_games[(filtered_games['starts_at'] >= start_date) & 
-                                        (filtered_games['starts_at'] <= end_date)]
-    
-    return jsonify(filtered_games.to_dict(orient='records'))
+    # Pagination (no limit returns all matches) and a comma-separated list of the fields to return
+    offset = request.args.get('offset', '0')
+    limit = request.args.get('limit')
+    fields = request.args.get('fields')
 
-@app.route("/optimizePackages", methods=["POST"])
-def optimize_packages():
-    data = request.json
+    if not offset.isdigit() or (limit is not None and not limit.isdigit()):
+        return jsonify({"error": "offset and limit must be non-negative integers."}), 400
+    offset = int(offset)
+    fields = fields.split(',') if fields else list(games_df.columns)
+    unknown_fields = [field for field in fields if field not in games_df.columns]
+    if unknown_fields:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown_fields)}. Use any of: {', '.join(games_df.columns)}."}), 400
+
+    invalid = invalid_dates(start_date, end_date)
+    if invalid:
+        return jsonify({"error": f"Invalid date '{invalid[0]}'. Use a date like 2024-08-01."}), 400
+
+    # Both dates are needed for the timespan filter
+    if not (start_date and end_date):
+        start_date = end_date = None
+    rows = game_index.search(name=name, start_date=start_date, end_date=end_date)
+    page = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+
+    # Only the requested page and fields are serialized
+    filtered_games = games_df.iloc[page][fields]
+
+    # The compiled store holds parsed dates, the API keeps sending them as in the CSV file
+    if 'starts_at' in fields and pd.api.types.is_datetime64_any_dtype(filtered_games['starts_at']):
+        filtered_games = filtered_games.assign(starts_at=filtered_games['starts_at'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+
+    response = jsonify(filtered_games.to_dict(orient='records'))
+    response.headers['X-Total-Count'] = str(len(rows))
+    return response
+
+def optimize_request(data, monitor=None, session=None):
+    """
+    Answers an /optimizePackages request.
+
+    Parameters:
+        data (dict): The request body.
+        monitor (progress.SolveMonitor, optional): Receives the solver progress and can cancel the solve.
+        session (session.OptimizationSession, optional): Session for requests without a "session_id".
+
+    Returns:
+        tuple: The response body (dict) and the HTTP status code (int).
+    """
+    # A numeric time limit counts from the start of the request
+    started = time.time()
     clubs = data.get('clubs', [])
     timespan = data.get('timespan', {})
     live_value = data.get('live_value', 0) / 100
     highlight_value = data.get('highlight_value', 0) / 100
+    # Time granularity of the subscription start dates: 'day', 'week', 'month' or 'auto'
+    granularity = data.get('granularity', 'day')
+    # Also solve the daily model to report the exact cost gap of a coarser granularity
+    compare_daily = bool(data.get('compare_daily', False))
+    # Presolve shrinks the model without changing the optimal cost; it can be turned off for debugging
+    use_presolve = bool(data.get('presolve', True))
+    # 'mip' solves optimally with CBC, 'greedy' answers fast with a heuristic (and a bound on its gap)
+    solver = data.get('solver', 'mip')
+    # Start CBC from the heuristic solution
+    warm_start = bool(data.get('warm_start', False))
+    # Budget in cents: cover as many games as possible without exceeding it
+    max_cost = data.get('max_cost')
+    # CBC limits: seconds for the request, relative gap and threads (missing ones use the server defaults)
+    limits = {name: data.get(name) for name in ('time_limit', 'gap', 'threads')}
+    # Client-chosen ID that groups the queries of one user (see `session.OptimizationSession`)
+    session_id = data.get('session_id')
+    # 'compact' lists every package once and dates as `date_format` (see `encoding.compact_response`);
+    # with "stream": true the compact games are streamed as newline-delimited JSON
+    response_format = data.get('format', 'full')
+    date_format = data.get('date_format', 'iso')
+    stream = data.get('stream', False)
 
     start_date = timespan.get('start_date')
     end_date = timespan.get('end_date')
 
+    invalid = invalid_dates(start_date, end_date)
+    if invalid:
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": f"Invalid date '{invalid[0]}'. Use a date like 2024-08-01.",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+
+    if granularity != 'auto' and granularity not in GRANULARITY_SPANS:
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": f"Unknown granularity '{granularity}'. Use one of: auto, {', '.join(GRANULARITY_SPANS)}.",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+
+    if solver not in SOLVERS:
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": f"Unknown solver '{solver}'. Use one of: {', '.join(SOLVERS)}.",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+
+    if max_cost is not None and (isinstance(max_cost, bool) or not isinstance(max_cost, (int, float)) or max_cost < 0):
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": f"Invalid max_cost '{max_cost}'. Use a non-negative number of cents.",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+
+    try:
+        deadline = request_deadline(limits, started)
+    except ValueError as e:
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": str(e),
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+
+    if response_format not in RESPONSE_FORMATS or date_format not in DATE_FORMATS or not isinstance(stream, bool) \
+            or (stream and response_format != 'compact'):
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": f"Invalid format '{response_format}', date_format '{date_format}' or stream '{stream}'. "
+                             f"Use a format of {', '.join(RESPONSE_FORMATS)}, a date_format of {', '.join(DATE_FORMATS)} "
+                             f"and stream only with the compact format.",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+
+    if session_id is not None and (not isinstance(session_id, str) or not 0 < len(session_id) <= 128):
+        response = {
+            "live_value": live_value,
+            "highlight_value": highlight_value,
+            "solver_status": f"Invalid session_id '{session_id}'. Use a string of 1 to 128 characters.",
+            "start_date": start_date,
+            "end_date": end_date,
+        }
+        return response, 400
+    if session_id is not None:
+        session = sessions.get(session_id)
+
     # Filter out irrelevant games
-    filtered_games = filter_games(games_df, clubs, start_date, end_date)
+    with span("filter_games") as entry:
+        filtered_games = filter_games(games_df, clubs, start_date, end_date, index=game_index)
+        if entry is not None:
+            entry["games"] = len(filtered_games)
 
     if filtered_games.empty:
         response = {
@@ -54,16 +316,19 @@ def optimize_packages():
             "start_date": start_date,
             "end_date": end_date,
         }
-        return jsonify(response), 404
+        return response, 404
 
     game_ids_of_interest = filtered_games['id'].tolist()
     init_num_games = len(game_ids_of_interest)
 
-    # Load streaming offers and packages data
-    streaming_offers_raw, streaming_packages_raw = load_streaming_data()
+    # Get the offers of the selected games and all packages from the in-memory catalog
+    with span("catalog"):
+        snapshot = catalog.get()
+        streaming_offers_raw = snapshot.offers_for_games(game_ids_of_interest)
+        streaming_packages_raw = snapshot.packages
 
-    # We need to keep this 'hardcoded' logic to force the solver to return live games
-    # If we would implement this with the penalty, costs would be too high and the solver would break / the IP would be infeasable.
+    # A value of 100 means "only live (highlight) games": drop the other offers instead of weighting them.
+    # Lower values become per-game penalties in the model (see `preference_weight`).
     if highlight_value >= 1:
         streaming_offers_raw = streaming_offers_raw[streaming_offers_raw['highlights'] == 1]
 
@@ -78,11 +343,27 @@ def optimize_packages():
             "start_date": start_date,
             "end_date": end_date,
         }
-        return jsonify(response), 404
+        return response, 404
     
+    # The coverage table replaces the offer lookups of preprocess_data: the precomputed one while the
+    # plans are up to date, else the one of the snapshot
+    with span("coverage"):
+        if plan_table is not None and plan_table.valid_for(snapshot):
+            coverage = plan_table.coverage
+        else:
+            coverage = snapshot.coverage(games_df)
+    if coverage.rows(game_ids_of_interest) is None:
+        coverage = None
+
     # Preprocess data
-    preprocessed_data = preprocess_data(
-        game_ids_of_interest, streaming_offers_raw, streaming_packages_raw, filtered_games, live_value, highlight_value)
+    with span("preprocess_data", coverage=coverage is not None):
+        if coverage is not None:
+            preprocessed_data = coverage.preprocess(game_ids_of_interest, live_value, highlight_value)
+        else:
+            preprocessed_data = preprocess_data(
+                game_ids_of_interest, streaming_offers_raw, streaming_packages_raw, filtered_games, live_value, highlight_value)
+    if session is not None:
+        session.set_data(snapshot, live_value, highlight_value)
     if len(preprocessed_data['packages']) <= 0:
         status = "No games found for the selected filters."
         if live_value >= 1:
@@ -96,40 +377,322 @@ def optimize_packages():
             "start_date": start_date,
             "end_date": end_date,
         }
-        return jsonify(response), 404
+        return response, 404
 
-    # Optimize streaming packages
-    results = optimize_streaming_packages(
-        preprocessed_data['packages'],
-        preprocessed_data['games'],
-        preprocessed_data['game_dates'],
-        preprocessed_data['C_month'],
-        preprocessed_data['C_year'],
-        preprocessed_data['P_g']
-    )
+    if max_cost is not None:
+        return optimize_budget(preprocessed_data, filtered_games, streaming_offers_raw, snapshot, granularity,
+                               float(max_cost), live_value, highlight_value, init_num_games, monitor, limits,
+                               deadline), 200
 
-    
+    # Single clubs over the whole date range have a precomputed optimal plan
+    precomputed = None
+    if (plan_table is not None and plan_table.valid_for(snapshot) and len(clubs) == 1 and not (start_date or end_date)
+            and granularity == 'day' and solver == 'mip'):
+        precomputed = plan_table.plan("club", clubs[0], data.get('live_value', 0), data.get('highlight_value', 0))
 
+    # Optimize streaming packages
+    with span("optimize") as entry:
+        if precomputed is not None:
+            results, cached = precomputed, True
+            if session is not None:
+                session.remember(results)
+        else:
+            results, cached = solve_cached(preprocessed_data, granularity, use_presolve, solver, warm_start, monitor,
+                                           limits, session, deadline)
+        if entry is not None:
+            entry.update(cached=cached, precomputed=precomputed is not None, status=results['status'])
+    annotate(cached=cached, precomputed=precomputed is not None, solver_statistics=results.get('statistics'))
 
     # Add package coverage information to the filtered games
-    filtered_games_with_coverage, start, end = add_package_coverage(
-        filtered_games[filtered_games['id'].isin(preprocessed_data['games'])], 
-        results, streaming_offers_raw, streaming_packages_raw.fillna('null'))
+    with span("add_package_coverage"):
+        filtered_games_with_coverage, start, end = add_package_coverage(
+            filtered_games[filtered_games['id'].isin(preprocessed_data['games'])],
+            results, streaming_offers_raw, snapshot.package_records)
+
+    with span("get_subscription_details"):
+        packages, cost = get_subscription_details(snapshot.package_records, results['active_yearly_subscriptions'], results['active_monthly_subscriptions'])
+
+    # Cost difference to the optimal daily model (None if the daily model has not been solved)
+    granularity_cost_gap = None
+    if results['same_as_daily']:
+        granularity_cost_gap = 0
+    elif compare_daily:
+        with span("compare_daily"):
+            daily_results, _ = solve_cached(preprocessed_data, 'day', use_presolve, solver, warm_start, monitor, limits,
+                                          deadline=deadline)
+        _, daily_cost = get_subscription_details(snapshot.package_records, daily_results['active_yearly_subscriptions'], daily_results['active_monthly_subscriptions'])
+        granularity_cost_gap = cost - daily_cost
+
+    # A solver limit stopped CBC before it proved optimality: say how far off the solution can be
+    solver_status = results['status']
+    if solver_status == 'Feasible' and results['optimality_gap'] is not None:
+        solver_status = f"Feasible, gap {results['optimality_gap']:.1%}"
+
+    response = {
+        "ignored_games": init_num_games - len(preprocessed_data['games']),
+        "live_value": live_value,
+        "highlight_value": highlight_value,
+        "solver_status": solver_status,
+        "granularity": results['granularity'],
+        "granularity_cost_gap": granularity_cost_gap,
+        "presolve": results.get('presolve'),
+        "objective_value": results['objective_value'],
+        "lower_bound": results['lower_bound'],
+        "optimality_gap": results['optimality_gap'],
+        "cached": cached,
+        "session_id": session_id,
+        "start_date": start,
+        "end_date": end,
+        "cost": cost,
+        "packages": packages,
+        "games": filtered_games_with_coverage
+    }
+
+    return response, 200
+
+def optimize_budget(preprocessed_data, filtered_games, streaming_offers_raw, snapshot, granularity, max_cost,
+                    live_value, highlight_value, init_num_games, monitor=None, limits=None, deadline=None):
+    """
+    Answers an /optimizePackages request with a budget: only the games covered within the budget are returned.
+    """
+    problem = [preprocessed_data[k] for k in ('packages', 'games', 'game_dates', 'C_month', 'C_year', 'P_g')]
+    # The game IDs are part of the key because the model reports covered and uncovered games by ID
+    key = problem_key(*problem, granularity=granularity, budget=True, game_ids=sorted(preprocessed_data['games']))
+    with span("optimize", budget=True):
+        model = budget_models.get(key, lambda: BudgetModel(*problem, granularity=granularity))
+        results = model.solve(max_cost, monitor, limits, deadline)
+
+    # Uncovered games are not shipped with coverage details, only their IDs
+    filtered_games_with_coverage, start, end = [], None, None
+    if results['covered_games']:
+        with span("add_package_coverage"):
+            filtered_games_with_coverage, start, end = add_package_coverage(
+                filtered_games[filtered_games['id'].isin(results['covered_games'])],
+                results, streaming_offers_raw, snapshot.package_records)
+
+    packages, cost = get_subscription_details(snapshot.package_records, results['active_yearly_subscriptions'], results['active_monthly_subscriptions'])
 
-    packages, cost = get_subscription_details(streaming_packages_raw.fillna('null'), results['active_yearly_subscriptions'], results['active_monthly_subscriptions'])
     response = {
         "ignored_games": init_num_games - len(preprocessed_data['games']),
         "live_value": live_value,
         "highlight_value": highlight_value,
         "solver_status": results['status'],
+        "granularity": results['granularity'],
+        "max_cost": max_cost,
+        "uncovered_game_ids": results['uncovered_games'],
         "start_date": start,
         "end_date": end,
         "cost": cost,
         "packages": packages,
         "games": filtered_games_with_coverage
     }
+    return response
+
+def traced_request(data, monitor=None, session=None):
+    """
+    Answers an /optimizePackages request under a trace and records its timings in the metrics.
+
+    With "debug": true in the request, the response gets a "debug" entry with the spans of all
+    stages and the solver statistics. With "profile": true (and PROFILE_REQUESTS=1), the request
+    runs under the sampling profiler and the debug entry also lists the hottest functions.
+
+    Returns:
+        tuple: The response body (dict), the HTTP status code (int) and the trace (Trace).
+    """
+    trace = Trace("optimizePackages")
+    profiler = SamplingProfiler() if PROFILE_REQUESTS and data.get('profile') else None
+    with trace.activate():
+        if profiler is None:
+            response, status_code = optimize_request(data, monitor, session)
+        else:
+            with profiler:
+                response, status_code = optimize_request(data, monitor, session)
+
+    metrics.observe("optimize_request_seconds", "Time to answer an optimization request.",
+                    trace.duration(), status_code=status_code)
+    for stage, seconds in trace.stages().items():
+        metrics.observe("optimize_stage_seconds", "Time spent per stage of an optimization request.",
+                        seconds, stage=stage)
+    # Only the first word: solver messages of failed requests are free text
+    status = str(response.get('solver_status')).split(',')[0] if status_code == 200 else "error"
+    metrics.inc("optimize_requests_total", "Optimization requests by HTTP and solver status.",
+                status_code=status_code, solver_status=status)
+    statistics = trace.attributes.get('solver_statistics')
+    if statistics and not trace.attributes.get('cached'):
+        for name in ("variables", "constraints", "nodes"):
+            if statistics[name] is not None:
+                metrics.observe(f"optimize_model_{name}", f"Model {name} per solved request (summed over components).",
+                                statistics[name], buckets=SIZE_BUCKETS)
+        metrics.observe("optimize_cbc_seconds", "Time in model solves per solved request.", statistics["solve_seconds"])
+
+    if data.get('debug'):
+        response["debug"] = trace.info()
+        if profiler is not None:
+            response["debug"]["profile"] = profiler.top()
+    if profiler is not None and PROFILE_DIR:
+        with open(os.path.join(PROFILE_DIR, f"{trace.id}.folded"), 'w', encoding='utf-8') as f:
+            f.write(profiler.collapsed())
+    return response, status_code, trace
+
+def optimize_batch(queries, workers=None):
+    """
+    Answers many /optimizePackages requests at once, e.g. the cheapest plan for every club.
+
+    The queries run in parallel and share the loaded data. Queries without a "session_id" and
+    with the same settings (see BATCH_SESSION_FIELDS) share a session, so components that several
+    of them have in common are solved once; identical problems are solved once as well.
+
+    Parameters:
+        queries (list): /optimizePackages request bodies.
+        workers (int, optional): Queries answered at the same time (default BATCH_WORKERS).
+
+    Yields:
+        dict: {"index", "status_code", "result"} per query as soon as it is answered (see `batch.run_batch`).
+    """
+    def settings(query):
+        return json.dumps([query.get(name) for name in BATCH_SESSION_FIELDS], default=str)
+
+    batch_sessions = {}
+    for query in queries:
+        batch_sessions.setdefault(settings(query), OptimizationSession())
+    yield from run_batch(queries, lambda query: traced_request(query, session=batch_sessions[settings(query)])[:2],
+                         workers)
+
+@app.before_request
+def start_timer():
+    request.started = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    metrics.observe("http_request_seconds", "HTTP request latency by endpoint.",
+                    time.perf_counter() - request.started, endpoint=request.endpoint or "unknown",
+                    method=request.method, status_code=response.status_code)
+    return response
+
+@app.route("/optimizePackages", methods=["POST"])
+def optimize_packages():
+    data = request.json
+    response, status_code, trace = traced_request(data)
+    content_encoding = request.accept_encodings.best_match(ENCODINGS)
+    compact = status_code == 200 and data.get('format') == 'compact'
+    serialize_start = time.perf_counter()
+    if compact:
+        response = compact_response(response, data.get('date_format', 'iso'))
+    if compact and data.get('stream'):
+        # Streamed bodies are encoded while they are sent, so there is no serialize timing
+        headers = {'Server-Timing': trace.server_timing(), 'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+        if content_encoding:
+            headers['Content-Encoding'] = content_encoding
+        return Response(compress_stream(stream_lines(response), content_encoding), status=status_code,
+                        mimetype='application/x-ndjson', headers=headers)
+    body = Response(dumps(response), mimetype='application/json') if compact else jsonify(response)
+    body.headers['Vary'] = 'Accept-Encoding'
+    if content_encoding and body.content_length >= COMPRESS_MIN_BYTES:
+        body.set_data(compress(body.get_data(), content_encoding))
+        body.headers['Content-Encoding'] = content_encoding
+    serialize_seconds = time.perf_counter() - serialize_start
+    metrics.observe("optimize_stage_seconds", "Time spent per stage of an optimization request.",
+                    serialize_seconds, stage="serialize")
+    body.headers['Server-Timing'] = f"{trace.server_timing()}, serialize;dur={serialize_seconds * 1000:.1f}"
+    return body, status_code
+
+@app.route("/optimizeBatch", methods=["POST"])
+def optimize_batch_route():
+    """
+    Answers a list of /optimizePackages queries ({"queries": [...]}) and streams the answers as
+    newline-delimited JSON, one {"index", "status_code", "result"} line per query in the order
+    they finish. Queries with "format": "compact" get compact results.
+    """
+    data = request.json or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, dict) for q in queries):
+        return jsonify({"error": "queries must be a non-empty list of /optimizePackages request bodies."}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch."}), 400
+
+    def stream():
+        for answer in optimize_batch(queries):
+            query = queries[answer['index']]
+            if query.get('format') == 'compact':
+                if answer['status_code'] == 200:
+                    answer = {**answer, "result": compact_response(answer['result'], query.get('date_format', 'iso'))}
+                yield dumps(answer) + b"\n"
+            else:
+                yield (app.json.dumps(answer) + "\n").encode('utf-8')
+
+    content_encoding = request.accept_encodings.best_match(ENCODINGS)
+    headers = {'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    if content_encoding:
+        headers['Content-Encoding'] = content_encoding
+    return Response(stream_with_context(compress_stream(stream(), content_encoding)), mimetype='application/x-ndjson',
+                    headers=headers)
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    # Same body as /optimizePackages; the optimization runs in the background
+    data = request.json
+    try:
+        job = job_manager.submit(lambda monitor: traced_request(data, monitor)[:2])
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({"job_id": job.id, "state": job.state}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'."}), 404
+    return jsonify(job.info())
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'."}), 404
+    return jsonify({"job_id": job.id, "state": job.state})
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Streams the state changes and the solver progress of a job as Server-Sent Events.
+
+    The stream ends after the job has finished; reconnecting clients resume after the
+    Last-Event-ID they got.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'."}), 404
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    first = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    def stream():
+        position = first
+        while True:
+            events = job.wait_for_events(position, timeout=15)
+            job.touch()
+            if not events:
+                if job.state in FINAL_STATES:
+                    return
+                # Keeps the connection (and the job) alive while CBC is quiet
+                yield ": keep-alive\n\n"
+                continue
+            for event_type, data in events:
+                yield f"id: {position}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+                position += 1
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route("/cacheStats", methods=["GET"])
+def cache_stats():
+    return jsonify({**solution_cache.info(), **sessions.info()})
 
-    return jsonify(response)
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Prometheus text format; every server process reports its own metrics
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Queries of a batch that run at the same time. CBC solves in its own processes, so the solves of
+# different queries use different cores; the Python stages share the interpreter.
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+
+
+def run_batch(queries, answer, workers=None):
+    """
+    Answers a list of queries in parallel and yields the answers as they finish.
+
+    Parameters:
+        queries (list): The queries, e.g. /optimizePackages request bodies.
+        answer (callable): Called with a query; returns the response body (dict) and the HTTP
+            status code (int).
+        workers (int, optional): Queries answered at the same time (default BATCH_WORKERS).
+
+    Yields:
+        dict: {"index", "status_code", "result"} per query in the order they finish, with
+        status code 500 and an "error" instead of the result if answering the query failed.
+        Closing the generator cancels the queries that have not started yet.
+    """
+    executor = ThreadPoolExecutor(max_workers=min(workers or BATCH_WORKERS, max(len(queries), 1)),
+                                  thread_name_prefix="batch")
+    try:
+        futures = {executor.submit(answer, query): i for i, query in enumerate(queries)}
+        for future in as_completed(futures):
+            try:
+                result, status_code = future.result()
+            except Exception as e:
+                yield {"index": futures[future], "status_code": 500, "error": str(e)}
+                continue
+            yield {"index": futures[future], "status_code": status_code, "result": result}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,118 @@
+"""
+Benchmark for the coverage annotation in service.add_package_coverage.
+
+Solves a problem per configuration once and then measures only the post-processing that adds
+the `covered_by` information to the games, for the join-based `add_package_coverage` and for the
+previous implementation that scanned the offers and packages for every (subscription, game) pair.
+
+Run from the BackEnd directory:
+    python benchmarks/bench_coverage.py [--legacy-limit SECONDS] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import warnings
+from datetime import timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from catalog import StreamingCatalog
+from service import load_games, filter_games, add_package_coverage
+from streaming_optimizer import preprocess_data, optimize_streaming_packages
+from bench_model_build import top_clubs
+
+
+def legacy_add_package_coverage(filtered_games, optimization_results, streaming_offers, streaming_packages):
+    # The annotation as it was before the join, kept here for comparison only
+    game_coverage = {game_id: [] for game_id in filtered_games['id'].tolist()}
+    filtered_games['starts_at'] = pd.to_datetime(filtered_games['starts_at'])
+
+    def get_live_highlights(game_id, package_id, packages):
+        offer = streaming_offers[(streaming_offers['game_id'] == game_id) & (streaming_offers['streaming_package_id'] == package_id)]
+        if not offer.empty:
+            package_info = packages[packages['id'] == package_id].iloc[0].to_dict()
+            package_info.update({
+                'live': offer.iloc[0]['live'].tolist(),
+                'highlights': offer.iloc[0]['highlights'].tolist()
+            })
+            return package_info
+        return None
+
+    for subscriptions, window in ((optimization_results["active_monthly_subscriptions"], 30),
+                                  (optimization_results["active_yearly_subscriptions"], 365)):
+        for sub in subscriptions:
+            start_date = pd.to_datetime(sub['start_date'])
+            end_date = start_date + timedelta(days=window)
+            covered_games = filtered_games[(filtered_games['starts_at'] >= start_date) & (filtered_games['starts_at'] <= end_date)]
+            for game_id in covered_games['id'].tolist():
+                coverage_info = get_live_highlights(game_id, sub['package'], streaming_packages)
+                if coverage_info:
+                    game_coverage[game_id].append(coverage_info)
+
+    filtered_games_with_coverage = filtered_games.copy()
+    filtered_games_with_coverage['covered_by'] = filtered_games_with_coverage['id'].apply(lambda x: game_coverage[x])
+    filtered_games_with_coverage = filtered_games_with_coverage.sort_values(by='starts_at')
+    start_date = filtered_games_with_coverage['starts_at'].min().strftime('%Y-%m-%d')
+    end_date = filtered_games_with_coverage['starts_at'].max().strftime('%Y-%m-%d')
+    return filtered_games_with_coverage.to_dict(orient='records'), start_date, end_date
+
+
+def solve(games_df, snapshot, clubs, start_date, end_date):
+    filtered_games = filter_games(games_df, clubs, start_date, end_date)
+    game_ids = filtered_games['id'].tolist()
+    offers = snapshot.offers_for_games(game_ids)
+    with contextlib.redirect_stdout(io.StringIO()):
+        p = preprocess_data(game_ids, offers, snapshot.packages, filtered_games, 0, 0)
+        results = optimize_streaming_packages(p['packages'], p['games'], p['game_dates'],
+                                              p['C_month'], p['C_year'], p['P_g'])
+    return filtered_games[filtered_games['id'].isin(p['games'])], results, offers
+
+
+def timed(annotate, args, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        args_ = (args[0].copy(),) + args[1:]
+        start = time.perf_counter()
+        output = annotate(*args_)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--legacy-limit', type=float, default=30.0,
+                        help='Skip the legacy implementation once a single run took longer than this (seconds).')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (the best one is reported).')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    games_df = load_games()
+    snapshot = StreamingCatalog().get()
+
+    print(f"{'clubs':>5} {'games':>6} {'subs':>5} {'pairs':>6} {'join [s]':>9} {'legacy [s]':>11} {'speedup':>8}")
+    legacy_enabled = True
+    for n in [1, 2, 5, 10, 20, 40]:
+        filtered_games, results, offers = solve(games_df, snapshot, top_clubs(games_df, n), '2024-08-01', '2025-06-01')
+        new_time, (games, _, _) = timed(add_package_coverage, (filtered_games, results, offers, snapshot.package_records),
+                                        args.repeat)
+        subscriptions = len(results['active_monthly_subscriptions']) + len(results['active_yearly_subscriptions'])
+        pairs = sum(len(game['covered_by']) for game in games)
+
+        legacy_text = '-'
+        speedup = '-'
+        if legacy_enabled:
+            legacy_time, _ = timed(legacy_add_package_coverage, (filtered_games, results, offers, snapshot.packages), 1)
+            legacy_text = f"{legacy_time:.3f}"
+            speedup = f"{legacy_time / new_time:.1f}x"
+            legacy_enabled = legacy_time < args.legacy_limit
+
+        print(f"{n:>5} {len(filtered_games):>6} {subscriptions:>5} {pairs:>6} {new_time:>9.4f} {legacy_text:>11} {speedup:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark for the model construction in streaming_optimizer.
+
+Measures how long building the MIP takes (without solving it) as the number of clubs and the
+date range grow, for the vectorized `build_model` and for the previous comprehension-based builder.
+
+Run from the BackEnd directory:
+    python benchmarks/bench_model_build.py [--legacy-limit SECONDS]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import warnings
+from datetime import timedelta
+
+import pulp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from catalog import StreamingCatalog
+from service import load_games, filter_games
+from streaming_optimizer import preprocess_data, build_model
+
+
+def legacy_build_model(packages, games, game_dates, C_month, C_year, P_g):
+    # The builder as it was before the vectorization, kept here for comparison only
+    filtered_C_month = {p: C_month[p] for p in C_month if p in packages}
+    filtered_C_year = {p: C_year[p] for p in C_year if p in packages}
+    adjusted_C_month = {p: cost + 1 for p, cost in filtered_C_month.items()}
+    adjusted_C_year = {p: cost + 12 for p, cost in filtered_C_year.items()}
+    start_dates = sorted(set(game_dates.values()))
+    coverage_month = {d: [g for g, gd in game_dates.items() if d <= gd <= d + timedelta(days=30)] for d in start_dates}
+    coverage_year = {d: [g for g, gd in game_dates.items() if d <= gd <= d + timedelta(days=365)] for d in start_dates}
+    model = pulp.LpProblem("Streaming_Package_Optimization", pulp.LpMinimize)
+    z_month = {(p, d): pulp.LpVariable(f"z_month_{p}_{d.strftime('%Y-%m-%d')}", cat='Binary')
+               for p in adjusted_C_month for d in start_dates}
+    z_year = {(p, d): pulp.LpVariable(f"z_year_{p}_{d.strftime('%Y-%m-%d')}", cat='Binary')
+              for p in adjusted_C_year for d in start_dates}
+    model += pulp.lpSum(adjusted_C_month[p] * z_month[p, d] for p in adjusted_C_month for d in start_dates) + \
+             pulp.lpSum(adjusted_C_year[p] * z_year[p, d] for p in adjusted_C_year for d in start_dates)
+    for g in games:
+        model += pulp.lpSum(z_month[p, d] for p in P_g[g] if p in adjusted_C_month for d in start_dates if g in coverage_month[d]) + \
+                 pulp.lpSum(z_year[p, d] for p in P_g[g] if p in adjusted_C_year for d in start_dates if g in coverage_year[d]) >= 1
+    return model
+
+
+def top_clubs(games_df, n):
+    counts = games_df['team_home'].value_counts().add(games_df['team_away'].value_counts(), fill_value=0)
+    return counts.sort_values(ascending=False).index[:n].tolist()
+
+
+def prepare(games_df, snapshot, clubs, start_date, end_date):
+    filtered_games = filter_games(games_df, clubs, start_date, end_date)
+    game_ids = filtered_games['id'].tolist()
+    with contextlib.redirect_stdout(io.StringIO()):
+        p = preprocess_data(game_ids, snapshot.offers_for_games(game_ids), snapshot.packages,
+                            filtered_games, 0, 0)
+    return (p['packages'], p['games'], p['game_dates'], p['C_month'], p['C_year'], p['P_g'])
+
+
+def timed(builder, args):
+    start = time.perf_counter()
+    model = builder(*args)
+    return time.perf_counter() - start, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--legacy-limit', type=float, default=30.0,
+                        help='Skip the legacy builder once a single build took longer than this (seconds).')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    games_df = load_games()
+    snapshot = StreamingCatalog().get()
+
+    date_ranges = [
+        ('2024-08-01', '2024-10-31'),
+        ('2024-08-01', '2025-06-01'),
+        (None, None),
+    ]
+    club_counts = [1, 2, 5, 10, 20, 40]
+
+    print(f"{'clubs':>5} {'range':>23} {'games':>6} {'vars':>7} {'rows':>5} {'build [s]':>10} {'legacy [s]':>11} {'speedup':>8}")
+    legacy_enabled = True
+    for start_date, end_date in date_ranges:
+        for n in club_counts:
+            args_ = prepare(games_df, snapshot, top_clubs(games_df, n), start_date, end_date)
+            new_time, built = timed(build_model, args_)
+            model = built['model']
+
+            legacy_text = '-'
+            speedup = '-'
+            if legacy_enabled:
+                legacy_time, _ = timed(legacy_build_model, args_)
+                legacy_text = f"{legacy_time:.3f}"
+                speedup = f"{legacy_time / new_time:.1f}x"
+                legacy_enabled = legacy_time < args.legacy_limit
+
+            date_range = f"{start_date or 'min'}..{end_date or 'max'}"
+            print(f"{n:>5} {date_range:>23} {len(args_[1]):>6} {model.numVariables():>7} {model.numConstraints():>5} "
+                  f"{new_time:>10.3f} {legacy_text:>11} {speedup:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark and regression check for the optimization pipeline.
+
+Runs query workloads built from the data files through the stages of an /optimizePackages
+request: filter_games, the offer lookup, preprocess_data, the optimization (with presolve, like
+the app), add_package_coverage and get_subscription_details. For every workload it records the
+wall time and the peak Python memory (tracemalloc, measured in a second run so it doesn't slow
+down the timed one; CBC runs in its own process and is not included) of each stage, the size of
+the model and the solver status.
+
+The workloads: the top club, the top 10 clubs and all clubs over one season, the games of the
+largest tournament and the top club over the whole date range. With --scales, the same workloads
+also run on synthetic catalogs with N times the games and packages (see `scaled_catalog`).
+
+Results are written as JSON. Given a baseline run, stages that got slower or need more memory
+than the threshold allows, and workloads whose status or cost changed, are reported as
+regressions and the script exits with status 1.
+
+Run from the BackEnd directory:
+    python benchmarks/bench_pipeline.py [--scales 1 10] [--output run.json] [--baseline old.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from catalog import CatalogSnapshot, OFFERS_FILE, PACKAGES_FILE
+from service import load_games, filter_games, add_package_coverage, get_subscription_details
+from streaming_optimizer import preprocess_data, coverage_matrix
+from presolve import optimize_with_presolve
+from bench_model_build import top_clubs
+
+SEASON = ('2024-08-01', '2025-06-01')
+STAGES = ["filter_games", "offers", "preprocess_data", "optimize", "add_package_coverage",
+          "get_subscription_details"]
+
+
+def scaled_catalog(games, offers, packages, scale, seed=0):
+    """
+    Builds a synthetic catalog with `scale` copies of every game and package.
+
+    Copy k of a game gets new team and tournament names (so club queries keep their size and
+    "all clubs" grows) and is streamed by copies k and k + 1 of the packages that stream the
+    original. Package copies get new IDs and prices that differ by up to 20%.
+
+    Returns:
+        tuple: The games, offers and packages (pd.DataFrame); scale 1 returns the originals.
+    """
+    if scale == 1:
+        return games, offers, packages
+    rng = np.random.default_rng(seed)
+    game_step = int(games['id'].max()) + 1
+    package_step = int(packages['id'].max()) + 1
+
+    game_copies, package_copies, offer_copies = [], [], []
+    for k in range(scale):
+        copy = games.copy()
+        copy['id'] += k * game_step
+        for column in ('team_home', 'team_away', 'tournament_name'):
+            copy[column] = copy[column].astype(str) + f" #{k}"
+        game_copies.append(copy)
+
+        copy = packages.copy()
+        copy['id'] += k * package_step
+        copy['name'] = copy['name'] + f" #{k}"
+        for column in ('monthly_price_cents', 'monthly_price_yearly_subscription_in_cents'):
+            copy[column] = (copy[column] * rng.uniform(0.8, 1.2, len(copy))).round()
+        package_copies.append(copy)
+
+        for j in {k, (k + 1) % scale}:
+            copy = offers.copy()
+            copy['game_id'] += k * game_step
+            copy['streaming_package_id'] += j * package_step
+            offer_copies.append(copy)
+
+    return (pd.concat(game_copies, ignore_index=True), pd.concat(offer_copies, ignore_index=True),
+            pd.concat(package_copies, ignore_index=True))
+
+
+def workloads(games):
+    """
+    Returns the workloads for a games table: name -> (games to search, clubs, start date, end date).
+    """
+    tournament = games['tournament_name'].value_counts().index[0]
+    tournament_games = games[games['tournament_name'] == tournament]
+    tournament_clubs = pd.unique(tournament_games[['team_home', 'team_away']].values.ravel()).tolist()
+    all_clubs = pd.unique(games[['team_home', 'team_away']].values.ravel()).tolist()
+    return {
+        "single_club": (games, top_clubs(games, 1), *SEASON),
+        "top_10_clubs": (games, top_clubs(games, 10), *SEASON),
+        "all_clubs": (games, all_clubs, *SEASON),
+        "tournament": (tournament_games, tournament_clubs, None, None),
+        "full_range": (games, top_clubs(games, 1), None, None),
+    }
+
+
+def run_workload(snapshot, workload, limits, memory):
+    """
+    Runs one workload through the pipeline.
+
+    Returns:
+        tuple: Per stage {"seconds"} (or {"peak_mb"} with memory=True), and the final outputs.
+    """
+    games, clubs, start_date, end_date = workload
+    stages = {}
+
+    def stage(name, function, *args, **kwargs):
+        if memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        output = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        if memory:
+            stages[name] = {"peak_mb": round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)}
+            tracemalloc.stop()
+        else:
+            stages[name] = {"seconds": round(elapsed, 4)}
+        return output
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        filtered_games = stage("filter_games", filter_games, games, clubs, start_date, end_date)
+        game_ids = filtered_games['id'].tolist()
+        offers = stage("offers", snapshot.offers_for_games, game_ids)
+        p = stage("preprocess_data", preprocess_data, game_ids, offers, snapshot.packages, filtered_games, 0, 0)
+        results = stage("optimize", optimize_with_presolve,
+                        *[p[k] for k in ('packages', 'games', 'game_dates', 'C_month', 'C_year', 'P_g')],
+                        limits=limits, preferences=p['preferences'])
+        stage("add_package_coverage", add_package_coverage,
+              filtered_games[filtered_games['id'].isin(p['games'])], results, offers, snapshot.package_records)
+        _, cost = stage("get_subscription_details", get_subscription_details, snapshot.package_records,
+                        results['active_yearly_subscriptions'], results['active_monthly_subscriptions'])
+    return stages, p, results, cost
+
+
+def benchmark(games, snapshot, limits, memory=True):
+    """
+    Runs all workloads on one catalog.
+
+    Returns:
+        dict: Workload name -> measurements.
+    """
+    measured = {}
+    for name, workload in workloads(games).items():
+        stages, p, results, cost = run_workload(snapshot, workload, limits, memory=False)
+        if memory:
+            memory_stages, _, _, _ = run_workload(snapshot, workload, limits, memory=True)
+            for stage, values in memory_stages.items():
+                stages[stage].update(values)
+
+        matrix = coverage_matrix(p['packages'], p['games'], p['game_dates'], p['C_month'], p['C_year'], p['P_g'])
+        measured[name] = {
+            "games": len(p['games']),
+            "packages": len(p['packages']),
+            "model": {
+                "variables": len(matrix["columns"]),
+                "constraints": len(p['games']),
+                "nonzeros": len(matrix["rows"]),
+                "presolved_variables": results['presolve']['variables_before'] - results['presolve']['variables_removed'],
+                "components": results['presolve']['components'],
+            },
+            "status": results['status'],
+            "optimality_gap": results['optimality_gap'],
+            "cost": float(cost),
+            "total_seconds": round(sum(s["seconds"] for s in stages.values()), 4),
+            "stages": stages,
+        }
+        print(f"{name:>14} {len(p['games']):>6} {len(matrix['columns']):>9} {results['status']:>10} "
+              + " ".join(f"{stages[s]['seconds']:>9.3f}" for s in STAGES), flush=True)
+    return measured
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold, min_seconds, min_mb):
+    """
+    Compares a run with a baseline run.
+
+    Parameters:
+        baseline (dict): Baseline results (as written by this script).
+        current (dict): Current results.
+        threshold (float): Allowed ratio current / baseline of stage times and peak memory.
+        min_seconds (float): Time differences below this are noise and never a regression.
+        min_mb (float): Memory differences below this are never a regression.
+
+    Returns:
+        list: Descriptions of the regressions.
+    """
+    regressions = []
+    for key, run in current["runs"].items():
+        base = baseline["runs"].get(key)
+        if base is None:
+            continue
+        if run["status"] != base["status"]:
+            regressions.append(f"{key}: status {base['status']} -> {run['status']}")
+        if abs(run["cost"] - base["cost"]) > 0.5:
+            regressions.append(f"{key}: cost {base['cost']:.0f} -> {run['cost']:.0f}")
+        for stage, values in run["stages"].items():
+            base_values = base["stages"].get(stage, {})
+            for measure, minimum in (("seconds", min_seconds), ("peak_mb", min_mb)):
+                if measure not in values or measure not in base_values:
+                    continue
+                old, new = base_values[measure], values[measure]
+                if new > old * threshold and new - old > minimum:
+                    regressions.append(f"{key}: {stage} {measure} {old} -> {new} ({new / max(old, 1e-9):.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10],
+                        help='Catalog sizes to run, as multiples of the real data (e.g. 1 10).')
+    parser.add_argument('--time-limit', type=float, default=120,
+                        help='Time limit of every optimization in seconds (0 for none).')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the memory measurement run.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare with the results of an earlier run (JSON file).')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Ratio to the baseline above which a stage counts as regressed.')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Time differences below this never count as a regression.')
+    parser.add_argument('--min-mb', type=float, default=1.0,
+                        help='Memory differences (MB) below this never count as a regression.')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    games = load_games()
+    offers, packages = pd.read_csv(OFFERS_FILE), pd.read_csv(PACKAGES_FILE)
+    limits = {"time_limit": args.time_limit}
+
+    current = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time_limit": args.time_limit,
+        },
+        "runs": {},
+    }
+    for scale in args.scales:
+        scaled_games, scaled_offers, scaled_packages = scaled_catalog(games, offers, packages, scale)
+        snapshot = CatalogSnapshot(scaled_offers, scaled_packages, mtimes=None)
+        print(f"\nScale x{scale}: {len(scaled_games)} games, {len(scaled_packages)} packages, {len(scaled_offers)} offers")
+        print(f"{'workload':>14} {'games':>6} {'variables':>9} {'status':>10} "
+              + " ".join(f"{s[:9]:>9}" for s in STAGES))
+        for name, measured in benchmark(scaled_games, snapshot, limits, memory=not args.no_memory).items():
+            current["runs"][f"{name}@x{scale}"] = measured
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_seconds, args.min_mb)
+        print(f"\nCompared with {args.baseline} ({baseline['meta'].get('commit')}):")
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("  No regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark for the live and highlight preferences in the optimization model.
+
+Solves the same queries across the preference slider range with the per-game preference
+penalties of `build_model` and with the previous model, which added 100 ** (5 * value) cents to
+the price of every package that streams one of the games without live (highlights). Reports the
+CBC time and branch and bound nodes, the real cost of the solution and the number of games that
+are not streamed live (with highlights) although some package would.
+
+Run from the BackEnd directory:
+    python benchmarks/bench_preferences.py [--clubs N [N ...]] [--values V [V ...]]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from catalog import StreamingCatalog
+from service import load_games, filter_games
+from streaming_optimizer import preprocess_data, build_model, bucket_start_dates, missed_preferences
+from progress import cbc_solver
+from bench_model_build import top_clubs
+
+
+def legacy_penalized_prices(p, offers, live_value, highlight_value):
+    # The penalties as they were before the preference model, kept here for comparison only
+    C_month, C_year = dict(p['C_month']), dict(p['C_year'])
+    for column, value in (('live', live_value), ('highlights', highlight_value)):
+        if value > 0:
+            for package in offers[offers[column] == 0]['streaming_package_id'].unique().tolist():
+                if package in C_month:
+                    C_month[package] += 100 ** (5 * value)
+                if package in C_year:
+                    C_year[package] += 100 ** (5 * value) * 12
+    return C_month, C_year
+
+
+def solve(p, C_month, C_year, preferences):
+    start_dates = bucket_start_dates(p['game_dates'], "day")
+    built = build_model(p['packages'], p['games'], p['game_dates'], C_month, C_year, p['P_g'],
+                        start_dates=start_dates, preferences=preferences)
+    cbc = cbc_solver(msg=False)
+    start = time.perf_counter()
+    built['model'].solve(cbc)
+    elapsed = time.perf_counter() - start
+    selected = [c for c, var in enumerate(built['variables']) if var.varValue is not None and var.varValue > 0.5]
+    return elapsed, cbc.nodes, selected
+
+
+def evaluate(p, selected):
+    # Real cost and missed preferred games of a selection, measured on the model with real prices
+    built = build_model(p['packages'], p['games'], p['game_dates'], p['C_month'], p['C_year'], p['P_g'],
+                        start_dates=bucket_start_dates(p['game_dates'], "day"), preferences=p['preferences'])
+    prices = {"month": p['C_month'], "year": p['C_year']}
+    cost = sum(prices[t][package] for t, package, _ in (built['matrix']['columns'][c] for c in selected))
+    missed = [int(missed_preferences(built['matrix'], preferred, selected, len(p['games'])).sum())
+              for _, preferred, _ in built['preferences']]
+    return cost, missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clubs', type=int, nargs='+', default=[3, 10], help='Numbers of top clubs to query.')
+    parser.add_argument('--values', type=float, nargs='+', default=[0.1, 0.3, 0.5, 0.7, 0.9, 0.99],
+                        help='Preference values (live and highlights) between 0 and 1.')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    games_df = load_games()
+    snapshot = StreamingCatalog().get()
+
+    print(f"{'clubs':>5} {'games':>6} {'value':>6} | {'model':>8} {'time [s]':>9} {'nodes':>6} "
+          f"{'cost':>8} {'no live':>8} {'no hl':>6}")
+    for n in args.clubs:
+        filtered_games = filter_games(games_df, top_clubs(games_df, n), '2024-08-01', '2025-06-01')
+        game_ids = filtered_games['id'].tolist()
+        offers = snapshot.offers_for_games(game_ids)
+        for value in args.values:
+            with contextlib.redirect_stdout(io.StringIO()):
+                p = preprocess_data(game_ids, offers, snapshot.packages, filtered_games, value, value)
+
+            runs = {
+                "penalty": solve(p, *legacy_penalized_prices(p, offers, value, value), None),
+                "weights": solve(p, p['C_month'], p['C_year'], p['preferences']),
+            }
+            for name, (elapsed, nodes, selected) in runs.items():
+                cost, (no_live, no_highlights) = evaluate(p, selected)
+                print(f"{n:>5} {len(p['games']):>6} {value:>6.2f} | {name:>8} {elapsed:>9.3f} {nodes if nodes is not None else '-':>6} "
+                      f"{cost:>8.0f} {no_live:>8} {no_highlights:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Regression check for the state that optimizations share: query sessions, batches and the
+solution cache.
+
+Runs a sequence of /optimizePackages queries that a user would send while tweaking a query
+(adding a club, moving the date range, changing the live and highlight values, the granularity
+and presolve) in three ways:
+    - stateless: every query on its own, with an empty solution cache,
+    - session: all queries in order in one session (see `session.OptimizationSession`),
+    - batch: all queries in one /optimizeBatch call (see `app.optimize_batch`),
+and then every query again on its own, this time with the solution cache the batch filled.
+All of them must give the stateless status, cost and objective value. Mismatches are reported
+and the script exits with status 1.
+
+Run from the BackEnd directory:
+    python benchmarks/check_reuse.py [--clubs N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import app
+from bench_model_build import top_clubs
+
+SEASON = {"start_date": "2024-08-01", "end_date": "2025-06-30"}
+LATE_SEASON = {"start_date": "2024-10-01", "end_date": "2025-06-30"}
+
+
+def queries(clubs):
+    """
+    Returns the query sequence: tweaks of the club selection and dates, each with different
+    preference values, granularities and presolve settings.
+    """
+    selections = [(clubs[:1], SEASON), (clubs[:2], SEASON), (clubs[:2], LATE_SEASON), (clubs[1:3], SEASON)]
+    settings = [
+        {"live_value": 0, "highlight_value": 0},
+        {"live_value": 90, "highlight_value": 0},
+        {"live_value": 90, "highlight_value": 0, "presolve": False},
+        {"live_value": 0, "highlight_value": 0, "presolve": False},
+        {"live_value": 40, "highlight_value": 20, "granularity": "week"},
+        {"live_value": 100, "highlight_value": 0},
+        {"live_value": 0, "highlight_value": 100, "granularity": "auto"},
+    ]
+    return [{"clubs": selected, "timespan": timespan, **setting}
+            for selected, timespan in selections for setting in settings]
+
+
+def outcome(response, status_code):
+    if status_code != 200:
+        return status_code, response.get('solver_status')
+    objective = response['objective_value']
+    return status_code, response['solver_status'], response['cost'], None if objective is None else round(objective, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clubs', type=int, default=3, help='Clubs (by number of games) to build the queries from.')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    sequence = queries(top_clubs(app.games_df, args.clubs))
+
+    def answer(query, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response, status_code, _ = app.traced_request(dict(query), **kwargs)
+        return outcome(response, status_code)
+
+    expected = []
+    for query in sequence:
+        app.solution_cache.clear()
+        expected.append(answer(query))
+
+    runs = {}
+    app.solution_cache.clear()
+    runs["session"] = [answer({**query, "session_id": "check_reuse"}) for query in sequence]
+
+    app.solution_cache.clear()
+    batch = [None] * len(sequence)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for result in app.optimize_batch(sequence):
+            batch[result["index"]] = outcome(result.get("result", {"solver_status": result.get("error")}),
+                                             result["status_code"])
+    runs["batch"] = batch
+    runs["after batch"] = [answer(query) for query in sequence]
+
+    mismatches = 0
+    for name, outcomes in runs.items():
+        for query, want, got in zip(sequence, expected, outcomes):
+            if got != want:
+                mismatches += 1
+                print(f"MISMATCH {name}: {query} gave {got}, stateless {want}")
+    print(f"{len(sequence)} queries, {len(runs)} runs, {mismatches} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pulp
+from progress import BOUND_TOLERANCE, cbc_solver
+from streaming_optimizer import GRANULARITY_SPANS, choose_granularity, bucket_start_dates, coverage_matrix, solver_limits
+
+
+class BudgetModel:
+    """
+    Maximum coverage under a budget: covers as many games as possible for at most `max_cost` cents.
+
+    The model is built once per problem. Moving the budget only changes the right-hand side of the
+    budget constraint and the weight of the coverage objective, and the next solve is warm
+    started from the previous solution whenever that one is still within the budget.
+
+    Ties between solutions that cover the same number of games are broken by the lower price.
+    The live/highlight preference penalties are not part of this model; the hard filters
+    (slider at 100%) still apply through the offers.
+    """
+
+    def __init__(self, packages, games, game_dates, price_month, price_year, P_g, granularity="day"):
+        """
+        Parameters:
+            packages, games, game_dates, P_g: See `optimize_streaming_packages`.
+            price_month (dict): Monthly prices per package (C_month of `preprocess_data`).
+            price_year (dict): Yearly prices per package (C_year of `preprocess_data`).
+            granularity (str): "day", "week", "month" or "auto".
+        """
+        if granularity == "auto":
+            granularity = choose_granularity(packages, game_dates)
+        if granularity not in GRANULARITY_SPANS:
+            raise ValueError(f"Unknown granularity '{granularity}'. Use one of: auto, {', '.join(GRANULARITY_SPANS)}.")
+        self.granularity = granularity
+        self.games = list(games)
+        self.lock = threading.Lock()
+
+        matrix = coverage_matrix(packages, self.games, game_dates, price_month, price_year, P_g,
+                                 start_dates=bucket_start_dates(game_dates, granularity))
+        self.columns = matrix["columns"]
+        prices = {"month": price_month, "year": price_year}
+        self.prices = [float(prices[t][p]) for t, p, _ in self.columns]
+        # Adjusted costs (with activation costs) break ties towards fewer subscriptions
+        self.costs = matrix["costs"].tolist()
+
+        self.model = pulp.LpProblem("Streaming_Package_Budget", pulp.LpMaximize)
+        self.z = [pulp.LpVariable(f"z_{t}_{p}_{d.strftime('%Y-%m-%d')}", cat='Binary') for t, p, d in self.columns]
+        self.y = [pulp.LpVariable(f"y_{i}", lowBound=0, upBound=1) for i in range(len(self.games))]
+
+        # A game counts as covered only if one of the selected subscriptions covers it
+        z_array = np.empty(len(self.z), dtype=object)
+        z_array[:] = self.z
+        row_vars = z_array[matrix["cols"]]
+        bounds = np.searchsorted(matrix["rows"], np.arange(len(self.games) + 1))
+        for i, y in enumerate(self.y):
+            row = dict.fromkeys(row_vars[bounds[i]:bounds[i + 1]].tolist(), -1)
+            row[y] = 1
+            self.model += pulp.LpConstraint(pulp.LpAffineExpression(row), sense=pulp.LpConstraintLE,
+                                            rhs=0, name=f"cover_{i}")
+
+        self.model += pulp.LpAffineExpression(list(zip(self.z, self.prices))) <= 0, "budget"
+        self.previous = None
+
+    def solve(self, max_cost, monitor=None, limits=None, deadline=None):
+        """
+        Solves the model for a budget.
+
+        Parameters:
+            max_cost (float): Budget in cents.
+            monitor (progress.SolveMonitor, optional): Receives the CBC progress and can cancel the solve.
+            limits (dict, optional): CBC limits, see `streaming_optimizer.DEFAULT_LIMITS`.
+            deadline (float, optional): time.time() by which the solve must end, see
+                `streaming_optimizer.request_deadline`.
+
+        Returns:
+            dict: Optimization results like `optimize_streaming_packages`, plus "covered_games" (list)
+            and "uncovered_games" (list) with the game IDs.
+        """
+        with self.lock:
+            self.model.constraints["budget"].constant = -max_cost
+            # One more covered game must outweigh any difference in cost. An optimal solution only
+            # selects subscriptions that cover something, so its cost is at most the budget plus
+            # 12 activation cost per game.
+            weight = max_cost + 12 * len(self.games) + 1
+            self.model.setObjective(pulp.LpAffineExpression(
+                [(y, weight) for y in self.y] + [(z, -cost) for z, cost in zip(self.z, self.costs)]))
+
+            # Warm start from the last solution if it still fits into the budget
+            warm_start = self.previous is not None and \
+                sum(self.prices[c] for c in self.previous) <= max_cost
+            if warm_start:
+                for c, z in enumerate(self.z):
+                    z.setInitialValue(1 if c in self.previous else 0)
+
+            options = solver_limits(len(self.z), self.model.numConstraints(), limits, deadline)
+            cbc = cbc_solver(monitor, warmStart=warm_start, **options)
+            status = pulp.LpStatus[self.model.solve(cbc)]
+            objective = pulp.value(self.model.objective) or 0
+            if status == "Optimal" and (self.model.sol_status == pulp.LpSolutionIntegerFeasible or cbc.bound is not None
+                                        and cbc.bound - objective > BOUND_TOLERANCE * max(1, abs(objective))):
+                # Stopped at a limit with the best solution found so far
+                status = "Feasible"
+            selected = {c for c, z in enumerate(self.z) if z.varValue is not None and z.varValue > 0.5}
+            covered = [g for g, y in zip(self.games, self.y) if y.varValue is not None and y.varValue > 0.5]
+            if status == "Optimal":
+                self.previous = selected
+
+        active = [self.columns[c] for c in sorted(selected)]
+        covered_set = set(covered)
+        return {
+            "status": status,
+            "granularity": self.granularity,
+            "active_monthly_subscriptions": [{"package": p, "start_date": d} for t, p, d in active if t == "month"],
+            "active_yearly_subscriptions": [{"package": p, "start_date": d} for t, p, d in active if t == "year"],
+            "covered_games": covered,
+            "uncovered_games": [g for g in self.games if g not in covered_set],
+        }
+
+
+class BudgetModelStore:
+    """
+    Keeps the most recently used budget models, so a budget change re-solves instead of rebuilding.
+    """
+
+    def __init__(self, max_models=32):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Returns the model stored under `key`, building it with `build()` if needed.
+        """
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+        model = build()
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return model
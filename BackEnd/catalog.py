@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from datastore import DataStore, manifest_path, store_is_current
+from coverage import CoverageTable
+
+OFFERS_FILE = 'data/bc_streaming_offer.csv'
+PACKAGES_FILE = 'data/bc_streaming_package.csv'
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """
+    Immutable, indexed view of the streaming offers and packages.
+
+    A snapshot is never modified after it has been built. Requests should grab one snapshot
+    at the beginning and use it until the response is sent, so a concurrent reload can't
+    hand them half of the old and half of the new data.
+    """
+
+    def __init__(self, streaming_offers, streaming_packages, mtimes, presorted=False):
+        # Sort once so that the rows of a game are contiguous (the compiled store is sorted already,
+        # copying it would give up the shared pages)
+        if presorted:
+            self.offers = streaming_offers
+            self.packages = streaming_packages
+        else:
+            self.offers = streaming_offers.sort_values(['game_id', 'streaming_package_id'], kind='stable') \
+                .reset_index(drop=True)
+            self.packages = streaming_packages.reset_index(drop=True)
+        self.mtimes = mtimes
+
+        # Positional index: game ID -> row positions in self.offers
+        self.offers_by_game = self.offers.groupby('game_id').indices
+
+        # Package rows as response-ready dictionaries (NaN prices become 'null' like in the API)
+        self.package_records = {
+            record['id']: record for record in self.packages.fillna('null').to_dict(orient='records')
+        }
+
+        # Coverage table of the offers, built by the first request that needs it
+        self._coverage = None
+        self._coverage_lock = threading.Lock()
+
+    def offers_for_games(self, game_ids):
+        """
+        Returns all offers for the given games without scanning the whole offers table.
+
+        Parameters:
+            game_ids (iterable): Game IDs to look up.
+
+        Returns:
+            pd.DataFrame: Offers of the given games (same columns as bc_streaming_offer.csv).
+        """
+        rows = [self.offers_by_game[g] for g in game_ids if g in self.offers_by_game]
+        if not rows:
+            return self.offers.iloc[0:0]
+        return self.offers.iloc[np.sort(np.concatenate(rows))]
+
+    def coverage(self, games_df):
+        """
+        Returns the coverage table (see `coverage.py`) of the given games and the offers of this
+        snapshot. It is built once per snapshot, so all calls must pass the same games.
+        """
+        with self._coverage_lock:
+            if self._coverage is None:
+                self._coverage = CoverageTable.from_data(games_df, self.offers, self.packages)
+            return self._coverage
+
+
+class StreamingCatalog:
+    """
+    Loads the streaming offers and packages once and keeps them in memory.
+
+    The data files are checked for changes at most every `check_interval` seconds. When
+    they change, the request that notices it builds a new snapshot and swaps it in
+    atomically; a failing reload keeps the previous snapshot alive.
+
+    If `store_dir` is set, the data is mapped from the compiled store (see `datastore.py`)
+    instead, as long as it is up to date. Its manifest is watched together with the CSV files:
+    once a CSV file is newer than the store, the data is read from the CSV files again until the
+    store is recompiled.
+    """
+
+    def __init__(self, offers_file=OFFERS_FILE, packages_file=PACKAGES_FILE, check_interval=5.0, store_dir=None):
+        self.offers_file = offers_file
+        self.packages_file = packages_file
+        self.store_dir = store_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._snapshot = self._build()
+
+    def _mtimes(self):
+        mtimes = (os.path.getmtime(self.offers_file), os.path.getmtime(self.packages_file))
+        if self.store_dir:
+            try:
+                return mtimes + (os.path.getmtime(manifest_path(self.store_dir)),)
+            except OSError:
+                # The store is being recompiled or was removed: the CSV files are used meanwhile
+                return mtimes + (None,)
+        return mtimes
+
+    def _build(self):
+        mtimes = self._mtimes()
+        if self.store_dir and store_is_current(os.path.dirname(self.offers_file) or '.', self.store_dir):
+            store = DataStore(self.store_dir)
+            return CatalogSnapshot(store.tables['offers'], store.tables['packages'], mtimes, presorted=True)
+        return CatalogSnapshot(pd.read_csv(self.offers_file), pd.read_csv(self.packages_file), mtimes)
+
+    def reload_if_changed(self):
+        """
+        Rebuilds the snapshot if one of the data files has been modified since the last load.
+
+        Returns:
+            bool: True if a new snapshot has been swapped in.
+        """
+        # Only one thread reloads, the others keep serving the current snapshot
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_check = time.monotonic()
+            try:
+                if self._mtimes() == self._snapshot.mtimes:
+                    return False
+                snapshot = self._build()
+            except (OSError, ValueError, pd.errors.ParserError):
+                # Files are missing or half written: keep serving the old data
+                logger.exception("Catalog reload failed, keeping previous data")
+                return False
+            self._snapshot = snapshot
+            return True
+        finally:
+            self._lock.release()
+
+    def get(self):
+        """
+        Returns the current snapshot, reloading it first if the data files changed.
+
+        Returns:
+            CatalogSnapshot: The snapshot to use for the whole request.
+        """
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.reload_if_changed()
+        return self._snapshot
@@ -0,0 +1,212 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+# Bit matrices of a coverage table: name -> offers column that selects the offers (None: all offers)
+MATRICES = {"offers": None, "live": 'live', "highlights": 'highlights'}
+
+# Penalty in cents for a game without the preferred quality (live, highlights) at a preference
+# value of 0.5. It grows with value / (1 - value): 9x at 0.9, 99x at 0.99.
+PREFERENCE_CENTS = 500
+# Higher preference values are capped; a value of 1 is handled by filtering the offers instead
+MAX_PREFERENCE_VALUE = 0.99
+
+
+def preference_weight(value):
+    """
+    Converts a preference value (0 to 1) into the penalty in cents for a game that no selected
+    package streams with the preferred quality.
+    """
+    value = min(value, MAX_PREFERENCE_VALUE)
+    return PREFERENCE_CENTS * value / (1 - value)
+
+
+def incidence_matrix(games, packages, P_g):
+    """
+    Converts a game -> packages mapping into a boolean matrix (games x packages).
+
+    Parameters:
+        games (list): Game IDs (rows).
+        packages (list): Package IDs (columns); packages of P_g that are not in the list are left out.
+        P_g (dict): Maps game IDs to lists of package IDs (missing games have none).
+
+    Returns:
+        np.ndarray: matrix[i, j] is True if package packages[j] is in P_g[games[i]].
+    """
+    matrix = np.zeros((len(games), len(packages)), dtype=bool)
+    lists = [P_g.get(g, ()) for g in games]
+    counts = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    if not len(packages) or not counts.sum():
+        return matrix
+    flat = np.fromiter(itertools.chain.from_iterable(lists), dtype=np.int64, count=int(counts.sum()))
+    ids = np.asarray(packages, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    cols = order[np.minimum(np.searchsorted(ids, flat, sorter=order), len(ids) - 1)]
+    known = ids[cols] == flat
+    matrix[np.repeat(np.arange(len(games)), counts)[known], cols[known]] = True
+    return matrix
+
+
+class CoverageTable:
+    """
+    Which package streams which game, as boolean matrices over all games (rows, sorted by ID) and
+    all packages (columns, sorted by ID): one for all offers, one for the live offers and one for
+    the offers with highlights.
+
+    The matrices are kept packed to one bit per entry (8 packages per byte); queries unpack only the
+    rows of their games. With the table, the input of the optimization for any set of games is a
+    few row lookups and bitwise operations (see `preprocess`) instead of filtering and grouping the
+    offers DataFrame. It is saved with the precomputed plans (see `plans.py`).
+    """
+
+    def __init__(self, game_ids, game_days, package_ids, package_order, price_month, price_year, bits):
+        """
+        Parameters:
+            game_ids (np.ndarray): Sorted game IDs.
+            game_days (np.ndarray): Kick-off day of every game (days since the epoch).
+            package_ids (np.ndarray): Sorted package IDs.
+            package_order (np.ndarray): Row of every package in the packages table (-1 if missing).
+            price_month (np.ndarray): Monthly price of every package in cents (NaN if none).
+            price_year (np.ndarray): Yearly price (12 monthly payments) in cents (NaN if none).
+            bits (dict): "offers", "live" and "highlights" -> packed bit matrix (games x packages,
+                see `np.packbits`).
+        """
+        self.game_ids = game_ids
+        self.game_days = game_days
+        self.package_ids = package_ids
+        self.package_order = package_order
+        self.price_month = price_month
+        self.price_year = price_year
+        self.bits = bits
+
+    @classmethod
+    def from_data(cls, games_df, offers, packages):
+        """
+        Builds the table from the games, offers and packages tables.
+        """
+        games_df = games_df.sort_values('id')
+        game_ids = games_df['id'].to_numpy(dtype=np.int64)
+        game_days = pd.to_datetime(games_df['starts_at']).to_numpy().astype('datetime64[D]').astype(np.int32)
+
+        package_ids = np.union1d(packages['id'].to_numpy(dtype=np.int64),
+                                 offers['streaming_package_id'].to_numpy(dtype=np.int64))
+        positions = np.searchsorted(package_ids, packages['id'].to_numpy(dtype=np.int64))
+        package_order = np.full(len(package_ids), -1, dtype=np.int32)
+        package_order[positions] = np.arange(len(packages))
+        price_month = np.full(len(package_ids), np.nan)
+        price_year = np.full(len(package_ids), np.nan)
+        price_month[positions] = packages['monthly_price_cents'].to_numpy(dtype=float)
+        price_year[positions] = packages['monthly_price_yearly_subscription_in_cents'].to_numpy(dtype=float) * 12
+
+        offers = offers[offers['game_id'].isin(game_ids)]
+        rows = np.searchsorted(game_ids, offers['game_id'].to_numpy(dtype=np.int64))
+        cols = np.searchsorted(package_ids, offers['streaming_package_id'].to_numpy(dtype=np.int64))
+        bits = {}
+        for name, column in MATRICES.items():
+            keep = np.ones(len(offers), dtype=bool) if column is None else offers[column].to_numpy() == 1
+            matrix = np.zeros((len(game_ids), len(package_ids)), dtype=bool)
+            matrix[rows[keep], cols[keep]] = True
+            bits[name] = np.packbits(matrix, axis=1)
+        return cls(game_ids, game_days, package_ids, package_order, price_month, price_year, bits)
+
+    def arrays(self):
+        """
+        Returns the table as arrays for `np.savez`, with the matrices packed to bits.
+        """
+        arrays = {
+            "game_ids": self.game_ids,
+            "game_days": self.game_days,
+            "package_ids": self.package_ids,
+            "package_order": self.package_order,
+            "price_month": self.price_month,
+            "price_year": self.price_year,
+        }
+        for name, bits in self.bits.items():
+            arrays[f"{name}_bits"] = bits
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["game_ids"], arrays["game_days"], arrays["package_ids"], arrays["package_order"],
+                   arrays["price_month"], arrays["price_year"], {name: arrays[f"{name}_bits"] for name in MATRICES})
+
+    def matrix(self, name, rows):
+        """
+        Returns the given rows of a matrix unpacked (bool array, rows x packages).
+        """
+        return np.unpackbits(self.bits[name][rows], axis=1, count=len(self.package_ids)).view(bool)
+
+    def rows(self, game_ids):
+        """
+        Returns the rows of the given games, or None if the table doesn't know one of them.
+        """
+        game_ids = np.asarray(game_ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.game_ids, game_ids), len(self.game_ids) - 1)
+        if len(self.game_ids) == 0 or not np.array_equal(self.game_ids[rows], game_ids):
+            return None
+        return rows
+
+    def _packages_per_game(self, games, matrix):
+        # Package IDs per game for the games with at least one package, in package ID order
+        r, c = np.nonzero(matrix)
+        bounds = np.searchsorted(r, np.arange(len(games) + 1))
+        package_ids = self.package_ids[c].tolist()
+        return {games[i]: package_ids[bounds[i]:bounds[i + 1]] for i in np.unique(r).tolist()}
+
+    def preprocess(self, game_ids, live_value, highlight_value, hard_filters=True):
+        """
+        Computes the input of the optimization for a set of games (see `preprocess_data`).
+
+        Parameters:
+            game_ids (list): Game IDs of the query (all must be in the table, see `rows`).
+            live_value (float): User's preference value for live streaming.
+            highlight_value (float): User's preference value for highlights.
+            hard_filters (bool): Apply the filters of the app for a live or highlight value of 1:
+                only the offers with the quality count.
+
+        Returns:
+            dict: The preprocessed data (see `preprocess_data`).
+        """
+        game_ids = list(game_ids)
+        rows = self.rows(game_ids)
+        live = self.matrix("live", rows)
+        highlights = self.matrix("highlights", rows)
+        available = self.matrix("offers", rows)
+        if hard_filters and live_value >= 1:
+            available = available & live
+        if hard_filters and highlight_value >= 1:
+            available = available & highlights
+
+        ### Step 1: Packages of the games, in the order of the packages table
+        relevant = available.any(axis=0) & (self.package_order >= 0)
+        if live_value > 1:
+            relevant &= ~(available & ~live).any(axis=0)
+        columns = np.flatnonzero(relevant)
+        columns = columns[np.argsort(self.package_order[columns], kind='stable')]
+        packages = self.package_ids[columns].tolist()
+        price_month = self.price_month[columns].tolist()
+        price_year = self.price_year[columns].tolist()
+
+        ### Step 2: Games with their dates and packages
+        has_offers = available.any(axis=1).tolist()
+        dates = self.game_days[rows].astype('datetime64[D]').astype(object).tolist()
+        P_g = self._packages_per_game(game_ids, available)
+
+        preferences = {}
+        for name, value, quality in (("live", live_value, live), ("highlights", highlight_value, highlights)):
+            if value > 0:
+                preferences[name] = {
+                    "weight": preference_weight(value),
+                    "P_g": self._packages_per_game(game_ids, available & quality),
+                }
+
+        return {
+            "packages": packages,
+            "games": [g for g, has in zip(game_ids, has_offers) if has],
+            "game_dates": dict(zip(game_ids, dates)),
+            "C_month": {p: c for p, c in zip(packages, price_month) if not np.isnan(c)},
+            "C_year": {p: c for p, c in zip(packages, price_year) if not np.isnan(c)},
+            "P_g": P_g,
+            "games_with_no_offers": [g for g, has in zip(game_ids, has_offers) if not has],
+            "preferences": preferences,
+        }
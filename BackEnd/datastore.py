@@ -0,0 +1,169 @@
+"""
+Compiled, memory-mapped copy of the CSV data files.
+
+`python datastore.py` turns the CSV files in data/ into a binary columnar store: one .npy file
+per column plus a JSON manifest. Dates are parsed once (seconds since the epoch), team
+and tournament names are dictionary-encoded and the offers are sorted by game. The app maps the
+store read-only at startup, so all workers of a server share the same pages instead of each holding
+its own pandas copy of the data.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+DATA_DIR = 'data'
+STORE_DIR = os.path.join(DATA_DIR, 'compiled')
+MANIFEST = 'manifest.json'
+
+# Table name -> CSV file in the data directory
+SOURCES = {
+    "games": "games_cleaned.csv",
+    "offers": "bc_streaming_offer.csv",
+    "packages": "bc_streaming_package.csv",
+    "free_tv": "freeTV_packages.csv",
+}
+# Columns that hold a date and time
+DATE_COLUMNS = {"starts_at"}
+# Text columns with few distinct values; other text columns are stored as fixed-width strings
+DICTIONARY_COLUMNS = {"team_home", "team_away", "tournament_name"}
+# Row order of the compiled tables (tables that are not listed keep the order of the CSV file)
+SORT_KEYS = {
+    "offers": ["game_id", "streaming_package_id"],
+}
+
+
+def manifest_path(store_dir=STORE_DIR):
+    return os.path.join(store_dir, MANIFEST)
+
+
+def _compile_table(df, table, store_dir, version):
+    """
+    Writes the columns of one table and returns their manifest entries.
+    """
+    columns = []
+    for name in df.columns:
+        entry = {"name": name, "file": f"{table}.{name}.{version}.npy"}
+        values = df[name]
+        if name in DATE_COLUMNS:
+            entry["kind"] = "date"
+            data = pd.to_datetime(values).to_numpy().astype('datetime64[s]')
+        elif name in DICTIONARY_COLUMNS:
+            # The codes have the width pandas uses for the categories, so they are not copied on load
+            categorical = pd.Categorical(values)
+            entry["kind"] = "dictionary"
+            entry["categories"] = categorical.categories.tolist()
+            data = categorical.codes
+        elif values.dtype == object:
+            entry["kind"] = "text"
+            data = values.to_numpy(dtype=str)
+            entry["missing"] = values.isna().to_numpy().nonzero()[0].tolist()
+        else:
+            entry["kind"] = "plain"
+            data = values.to_numpy()
+        np.save(os.path.join(store_dir, entry["file"]), data)
+        columns.append(entry)
+    return columns
+
+
+def compile_data(data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """
+    Compiles the CSV files into the columnar store.
+
+    The column files of a compilation carry a version in their name and the manifest is replaced
+    atomically at the end, so running servers never see a half-written store. Files of older
+    versions are removed afterwards; processes that still map them keep their pages.
+
+    Parameters:
+        data_dir (str): Directory with the CSV files.
+        store_dir (str): Directory of the compiled store.
+
+    Returns:
+        dict: The manifest of the new store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    version = str(time.time_ns())
+    manifest = {"version": version, "sources": {}, "tables": {}}
+    for table, file_name in SOURCES.items():
+        path = os.path.join(data_dir, file_name)
+        manifest["sources"][table] = {"file": path, "mtime": os.path.getmtime(path)}
+        df = pd.read_csv(path)
+        if table in SORT_KEYS:
+            df = df.sort_values(SORT_KEYS[table], kind='stable').reset_index(drop=True)
+        manifest["tables"][table] = {
+            "rows": len(df),
+            "columns": _compile_table(df, table, store_dir, version),
+        }
+
+    tmp_path = f"{manifest_path(store_dir)}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(store_dir))
+
+    for entry in os.scandir(store_dir):
+        if entry.name.endswith('.npy') and f".{version}." not in entry.name:
+            os.remove(entry.path)
+    return manifest
+
+
+class DataStore:
+    """
+    Read-only view of a compiled store.
+
+    Attributes:
+        tables (dict): Table name -> pd.DataFrame whose columns are backed by the mapped files.
+            Date columns are datetime64[s], dictionary-encoded columns are categoricals. Other text
+            columns are decoded into regular (unshared) object columns, they only exist in small tables.
+        manifest (dict): The manifest the store has been opened with.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        with open(manifest_path(store_dir), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.tables = {}
+        for table, spec in self.manifest["tables"].items():
+            columns = {}
+            for entry in spec["columns"]:
+                data = np.load(os.path.join(store_dir, entry["file"]), mmap_mode='r')
+                if entry["kind"] == "dictionary":
+                    data = pd.Categorical.from_codes(data, entry["categories"])
+                elif entry["kind"] == "text":
+                    data = data.astype(object)
+                    data[entry["missing"]] = np.nan
+                columns[entry["name"]] = data
+            # copy=False keeps the columns on the mapped pages
+            self.tables[table] = pd.DataFrame(columns, copy=False)
+
+
+def store_is_current(data_dir=DATA_DIR, store_dir=STORE_DIR):
+    """
+    Checks that a compiled store exists and that none of its CSV files changed since it was compiled.
+    """
+    try:
+        with open(manifest_path(store_dir), encoding='utf-8') as f:
+            sources = json.load(f)["sources"]
+        return all(
+            table in sources and os.path.getmtime(os.path.join(data_dir, file_name)) <= sources[table]["mtime"]
+            for table, file_name in SOURCES.items()
+        )
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compiles the CSV data files into the memory-mapped columnar store.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory with the CSV files.')
+    parser.add_argument('--store-dir', default=STORE_DIR, help='Directory of the compiled store.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = compile_data(args.data_dir, args.store_dir)
+    for table, spec in manifest["tables"].items():
+        print(f"{table}: {spec['rows']} rows, {len(spec['columns'])} columns")
+    print(f"Compiled into {args.store_dir} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+
+# orjson encodes the compact responses several times faster; without it the standard library is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Brotli compresses better than gzip; only offered if the package is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response formats of /optimizePackages ("format" in the request)
+RESPONSE_FORMATS = ("full", "compact")
+# Date formats of the compact response ("date_format" in the request)
+DATE_FORMATS = ("iso", "epoch_days")
+# Content encodings the server can compress with, best first
+ENCODINGS = (["br"] if brotli is not None else []) + ["gzip"]
+# Smaller bodies are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+# Games per chunk of a streamed response
+STREAM_CHUNK_GAMES = 500
+EPOCH = date(1970, 1, 1)
+
+
+def format_date(value, date_format):
+    """
+    Converts a date, a datetime (e.g. a pd.Timestamp) or an ISO date string into the date format of
+    the compact response: an ISO string or the number of days since 1970-01-01 (the time of day is
+    dropped).
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    if date_format == "epoch_days":
+        day = value.date() if isinstance(value, datetime) else value
+        return (day - EPOCH).days
+    return value.isoformat()
+
+
+def compact_response(response, date_format="iso"):
+    """
+    Converts an /optimizePackages response into the compact format.
+
+    In the full response, every game lists complete copies of the packages that cover it. The
+    compact response lists every package once in "package_table" (package ID -> package row)
+    and refers to it by ID:
+        - "packages": The subscriptions as {"package_id", "price", "start_date", "yearly"}.
+        - "games": The games with "covered_by" as [package ID, live, highlights] triples.
+    All dates are ISO strings or days since 1970-01-01 (see `format_date`).
+
+    Parameters:
+        response (dict): The response body of a successful request (error responses are
+            returned unchanged).
+        date_format (str): "iso" or "epoch_days".
+
+    Returns:
+        dict: The compact response body.
+    """
+    if "games" not in response:
+        return response
+    package_table = {}
+
+    def package_id(package):
+        package_table.setdefault(package['id'], {k: v for k, v in package.items() if k not in ('live', 'highlights')})
+        return package['id']
+
+    subscriptions = [{
+        "package_id": package_id(subscription['package']),
+        "price": subscription['price'],
+        "start_date": format_date(subscription['start_date'], date_format),
+        "yearly": subscription['yearly'],
+    } for subscription in response['packages']]
+
+    # Games covered by the same package with the same flags share the package dictionary
+    triples = {}
+    games = []
+    for game in response['games']:
+        covered_by = []
+        for package in game['covered_by']:
+            triple = triples.get(id(package))
+            if triple is None:
+                triple = triples[id(package)] = [package_id(package), package['live'], package['highlights']]
+            covered_by.append(triple)
+        games.append({**game, "starts_at": format_date(game['starts_at'], date_format), "covered_by": covered_by})
+
+    return {
+        **response,
+        "start_date": format_date(response['start_date'], date_format),
+        "end_date": format_date(response['end_date'], date_format),
+        "date_format": date_format,
+        "package_table": {str(p): package_table[p] for p in sorted(package_table)},
+        "packages": subscriptions,
+        "games": games,
+    }
+
+
+def _default(value):
+    # NumPy scalars and dates that end up in the debug information
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """
+    Encodes a compact response (or any JSON-like object) as UTF-8 JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def stream_lines(response):
+    """
+    Yields a compact response as newline-delimited JSON in chunks: first the response without
+    the games (with "games" replaced by their number), then one line per game.
+    """
+    games = response.get('games', [])
+    yield dumps({**response, "games": len(games)}) + b"\n"
+    for i in range(0, len(games), STREAM_CHUNK_GAMES):
+        yield b"".join(dumps(game) + b"\n" for game in games[i:i + STREAM_CHUNK_GAMES])
+
+
+def compress(body, encoding):
+    """
+    Compresses a response body with a content encoding of ENCODINGS.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compresses a streamed response chunk by chunk; every chunk is flushed, so the client can
+    decode it as soon as it arrives. Without an encoding the chunks are passed through.
+    """
+    if encoding is None:
+        yield from chunks
+        return
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    # wbits=31: gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+def normalize(name):
+    """
+    Normalizes a team name or search string for case-insensitive matching.
+    """
+    return " ".join(str(name).casefold().split())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class GameIndex:
+    """
+    Prebuilt lookup structures over the games table, so requests don't scan all games.
+
+    All lookups return sorted row positions in `games`, which keeps the order of the table:
+        - Teams: Every team name maps to the rows of its home and away games.
+        - Partial names: A trigram index over the normalized team names finds the teams whose name
+          contains a search string; the few candidates are then checked with a substring test.
+        - Dates: The rows sorted by kick-off, so a date range is found with two binary searches.
+    """
+
+    def __init__(self, games):
+        self.games = games
+
+        ### Step 1: Rows of every team
+        team_rows = {}
+        for column in ('team_home', 'team_away'):
+            for team, rows in games.groupby(column, observed=True, sort=False).indices.items():
+                team_rows.setdefault(team, []).append(rows)
+        self.teams = sorted(team_rows)
+        self.team_rows = {team: np.unique(np.concatenate(rows)) for team, rows in team_rows.items()}
+
+        ### Step 2: Trigram index over the normalized team names
+        self.normalized_teams = [normalize(team) for team in self.teams]
+        self.trigram_teams = {}
+        for i, name in enumerate(self.normalized_teams):
+            for trigram in trigrams(name):
+                self.trigram_teams.setdefault(trigram, set()).add(i)
+
+        ### Step 3: Rows sorted by kick-off
+        times = pd.to_datetime(games['starts_at']).to_numpy()
+        self.date_order = np.argsort(times, kind='stable')
+        self.sorted_times = times[self.date_order]
+
+    def teams_matching(self, query):
+        """
+        Returns the team names that contain `query` (case-insensitive).
+        """
+        query = normalize(query)
+        if len(query) < 3:
+            candidates = range(len(self.teams))
+        else:
+            sets = [self.trigram_teams.get(trigram, set()) for trigram in trigrams(query)]
+            candidates = sorted(set.intersection(*sets))
+        return [self.teams[i] for i in candidates if query in self.normalized_teams[i]]
+
+    def rows_for_teams(self, teams):
+        """
+        Returns the rows of all games in which one of the teams plays.
+        """
+        rows = [self.team_rows[team] for team in teams if team in self.team_rows]
+        if not rows:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(rows))
+
+    def rows_between(self, start_date=None, end_date=None):
+        """
+        Returns the rows of the games with start_date <= starts_at <= end_date (both bounds optional).
+        """
+        lo, hi = 0, len(self.sorted_times)
+        if start_date:
+            lo = np.searchsorted(self.sorted_times, pd.Timestamp(start_date).to_datetime64(), side='left')
+        if end_date:
+            hi = np.searchsorted(self.sorted_times, pd.Timestamp(end_date).to_datetime64(), side='right')
+        return np.sort(self.date_order[lo:hi])
+
+    def search(self, name=None, clubs=None, start_date=None, end_date=None):
+        """
+        Finds the games matching all given filters.
+
+        Parameters:
+            name (str): Part of the name of the home or away team (case-insensitive).
+            clubs (list): Exact team names; games of any of them match.
+            start_date (str): Earliest kick-off.
+            end_date (str): Latest kick-off.
+
+        Returns:
+            np.ndarray: Sorted row positions in `games`.
+        """
+        rows = None
+        if name:
+            rows = self.rows_for_teams(self.teams_matching(name))
+        if clubs is not None:
+            club_rows = self.rows_for_teams(clubs)
+            rows = club_rows if rows is None else np.intersect1d(rows, club_rows, assume_unique=True)
+        if start_date or end_date:
+            date_rows = self.rows_between(start_date, end_date)
+            rows = date_rows if rows is None else np.intersect1d(rows, date_rows, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self.games))
+        return rows
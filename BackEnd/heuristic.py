@@ -0,0 +1,181 @@
+import heapq
+import numpy as np
+
+# Columns are converted to bitsets in blocks of this many columns to bound the memory use
+BITSET_BLOCK = 1024
+
+
+def column_bitsets(matrix, n_games):
+    """
+    Converts the coverage matrix into one bitset (int) of covered games per column.
+
+    Parameters:
+        matrix (dict): Coverage matrix (see `streaming_optimizer.coverage_matrix`).
+        n_games (int): Number of games (rows) of the matrix.
+
+    Returns:
+        list: Bitset of covered games for every column; bit i stands for games[i].
+    """
+    n_cols = len(matrix["columns"])
+    order = np.argsort(matrix["cols"], kind='stable')
+    cols = matrix["cols"][order]
+    rows = matrix["rows"][order]
+    bitsets = []
+    for block_start in range(0, n_cols, BITSET_BLOCK):
+        block_end = min(block_start + BITSET_BLOCK, n_cols)
+        lo, hi = np.searchsorted(cols, [block_start, block_end])
+        dense = np.zeros((block_end - block_start, n_games), dtype=bool)
+        dense[cols[lo:hi] - block_start, rows[lo:hi]] = True
+        packed = np.packbits(dense, axis=1, bitorder='little')
+        bitsets.extend(int.from_bytes(row.tobytes(), 'little') for row in packed)
+    return bitsets
+
+
+def greedy_cover(costs, bitsets, n_games):
+    """
+    Weighted set cover heuristic: repeatedly picks the column with the lowest cost per newly covered game.
+
+    Uses lazy evaluation: a column's ratio only gets worse over time, so a popped column whose
+    stored ratio is still up to date is the best choice.
+
+    Returns:
+        list: Indices of the selected columns, or None if some game can't be covered.
+    """
+    uncovered = (1 << n_games) - 1
+    heap = [(costs[c] / bits.bit_count(), c) for c, bits in enumerate(bitsets) if bits]
+    heapq.heapify(heap)
+    selected = []
+    while uncovered and heap:
+        ratio, c = heapq.heappop(heap)
+        new = (bitsets[c] & uncovered).bit_count()
+        if new == 0:
+            continue
+        current = costs[c] / new
+        if current > ratio and heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, c))
+            continue
+        selected.append(c)
+        uncovered &= ~bitsets[c]
+    if uncovered:
+        return None
+    return selected
+
+
+def _coverage_counts(selected, bitsets, n_games):
+    counts = np.zeros(n_games, dtype=np.int64)
+    for c in selected:
+        counts[_bit_indices(bitsets[c], n_games)] += 1
+    return counts
+
+
+def _bit_indices(bits, n_games):
+    packed = np.frombuffer(bits.to_bytes((n_games + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder='little')[:n_games])
+
+
+def covering_columns(matrix, n_games):
+    """
+    Returns, for every game, the columns that cover it ordered by cost.
+    """
+    bounds = np.searchsorted(matrix["rows"], np.arange(n_games + 1))
+    costs = matrix["costs"]
+    covering = []
+    for r in range(n_games):
+        cols = matrix["cols"][bounds[r]:bounds[r + 1]]
+        covering.append(cols[np.argsort(costs[cols], kind='stable')].tolist())
+    return covering
+
+
+def local_search(selected, costs, bitsets, covering, n_games, max_passes=10):
+    """
+    Improves a cover by removing redundant columns and swapping columns for cheaper ones.
+
+    A column is redundant if every game it covers is covered by another selected column too.
+    A column can be swapped for any cheaper column that covers all games only it covers, and a
+    pair of columns for any column that is cheaper than both together and covers the games only
+    the pair covers.
+
+    Parameters:
+        selected (list): Indices of the columns of a cover.
+        costs (list): Cost of every column.
+        bitsets (list): Covered games of every column (see `column_bitsets`).
+        covering (list): Columns covering each game (see `covering_columns`).
+        n_games (int): Number of games.
+        max_passes (int): Maximum number of improvement rounds.
+
+    Returns:
+        list: Indices of the selected columns after the improvement.
+    """
+    selected = list(selected)
+    counts = _coverage_counts(selected, bitsets, n_games)
+
+    def drop_redundant():
+        # Most expensive first, they save the most
+        for c in sorted(selected, key=lambda c: -costs[c]):
+            games = _bit_indices(bitsets[c], n_games)
+            if np.all(counts[games] >= 2):
+                counts[games] -= 1
+                selected.remove(c)
+
+    def replace(removed, budget, unique):
+        # Cheapest column below the budget that covers all games in `unique`; it has to cover
+        # the first of these games, so only the columns covering that one are candidates
+        if not unique:
+            return False
+        first = (unique & -unique).bit_length() - 1
+        for candidate in covering[first]:
+            if costs[candidate] >= budget:
+                return False
+            if candidate not in removed and bitsets[candidate] & unique == unique:
+                for c in removed:
+                    counts[_bit_indices(bitsets[c], n_games)] -= 1
+                    selected.remove(c)
+                counts[_bit_indices(bitsets[candidate], n_games)] += 1
+                selected.append(candidate)
+                return True
+        return False
+
+    drop_redundant()
+    for _ in range(max_passes):
+        improved = False
+        for c in sorted(selected, key=lambda c: -costs[c]):
+            if c not in selected:
+                continue
+            games = _bit_indices(bitsets[c], n_games)
+            unique = sum(1 << int(g) for g in games[counts[games] == 1])
+            improved |= replace((c,), costs[c], unique)
+
+        ordered = sorted(selected, key=lambda c: -costs[c])
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:]:
+                if a not in selected or b not in selected:
+                    continue
+                games = np.union1d(_bit_indices(bitsets[a], n_games), _bit_indices(bitsets[b], n_games))
+                # Games that would be uncovered without a and b
+                both = counts[games] - np.isin(games, _bit_indices(bitsets[a], n_games)) \
+                    - np.isin(games, _bit_indices(bitsets[b], n_games))
+                unique = sum(1 << int(g) for g in games[both == 0])
+                improved |= replace((a, b), costs[a] + costs[b], unique)
+        if not improved:
+            break
+        drop_redundant()
+    return selected
+
+
+def heuristic_solution(matrix, n_games):
+    """
+    Computes a cover of all games with the greedy heuristic followed by local search.
+
+    Parameters:
+        matrix (dict): Coverage matrix (see `streaming_optimizer.coverage_matrix`).
+        n_games (int): Number of games (rows) of the matrix.
+
+    Returns:
+        list: Indices of the selected columns, or None if some game can't be covered.
+    """
+    bitsets = column_bitsets(matrix, n_games)
+    costs = matrix["costs"].tolist()
+    selected = greedy_cover(costs, bitsets, n_games)
+    if selected is None:
+        return None
+    return local_search(selected, costs, bitsets, covering_columns(matrix, n_games), n_games)
@@ -0,0 +1,203 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from progress import Cancelled, SolveMonitor
+
+# Job states; a job in one of the final states doesn't change anymore
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while the queue is at its limit.
+    """
+
+
+class Job:
+    """
+    One optimization running in the background.
+
+    Everything the job reports is appended to `events` ("state" and "progress" events), so
+    listeners can replay the events they missed and then wait for new ones.
+    """
+
+    def __init__(self, run):
+        self.id = uuid.uuid4().hex
+        self.run = run
+        self.state = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.status_code = None
+        self.error = None
+        self.progress = None
+        self.events = []
+        self.last_access = time.monotonic()
+        self.future = None
+        self.monitor = SolveMonitor(report=self._report_progress)
+        self._changed = threading.Condition()
+
+    def _publish(self, event_type, data):
+        with self._changed:
+            self.events.append((event_type, data))
+            self._changed.notify_all()
+
+    def _report_progress(self, progress):
+        self.progress = progress
+        self._publish("progress", progress)
+
+    def _set_state(self, state):
+        self.state = state
+        if state == RUNNING:
+            self.started = time.time()
+        elif state in FINAL_STATES:
+            self.finished = time.time()
+        self._publish("state", {"state": state})
+
+    def touch(self):
+        """
+        Marks the job as still wanted by a client.
+        """
+        self.last_access = time.monotonic()
+
+    def wait_for_events(self, first, timeout):
+        """
+        Returns the events from index `first` on, waiting up to `timeout` seconds if there are none yet.
+        """
+        with self._changed:
+            if len(self.events) <= first and self.state not in FINAL_STATES:
+                self._changed.wait(timeout)
+            return self.events[first:]
+
+    def info(self):
+        """
+        Returns the state of the job, with the result once it is done.
+        """
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": self.progress,
+            "result": self.result,
+            "result_status_code": self.status_code,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded pool of worker threads.
+
+    At most `workers` jobs run at the same time and at most `max_queued` wait for a worker; further
+    submissions are rejected instead of piling up. Finished jobs are kept for `keep_seconds`. Jobs
+    whose client stopped asking for them for `abandon_seconds` are cancelled, so a reloaded page
+    doesn't leave a CBC process running.
+    """
+
+    def __init__(self, workers=2, max_queued=16, keep_seconds=600, abandon_seconds=60):
+        self.max_queued = max_queued
+        self.keep_seconds = keep_seconds
+        self.abandon_seconds = abandon_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        reaper = threading.Thread(target=self._reap_forever, name="job-reaper", daemon=True)
+        reaper.start()
+
+    def submit(self, run):
+        """
+        Queues a job.
+
+        Parameters:
+            run (callable): Called with the job's `SolveMonitor`; returns the result and an HTTP status code.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(run)
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.state == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs are waiting already, try again later.")
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._execute, job)
+        return job
+
+    def _execute(self, job):
+        if job.state != QUEUED:
+            return
+        job._set_state(RUNNING)
+        try:
+            job.result, job.status_code = job.run(job.monitor)
+            job._set_state(DONE)
+        except Cancelled:
+            job._set_state(CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            job._set_state(FAILED)
+
+    def get(self, job_id):
+        """
+        Returns the job with the given ID (or None) and marks it as still wanted.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.touch()
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued or running job; running jobs get their CBC process killed.
+
+        Returns:
+            Job: The job, or None if there is no job with this ID.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            self._cancel(job)
+        return job
+
+    def _cancel(self, job):
+        if job.state == QUEUED and job.future.cancel():
+            job._set_state(CANCELLED)
+        elif job.state not in FINAL_STATES:
+            job.monitor.cancel()
+
+    def reap(self):
+        """
+        Cancels abandoned jobs and forgets finished jobs that are older than `keep_seconds`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.state in FINAL_STATES:
+                if time.time() - job.finished > self.keep_seconds:
+                    with self._lock:
+                        self._jobs.pop(job.id, None)
+            elif now - job.last_access > self.abandon_seconds:
+                self._cancel(job)
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(min(5, self.abandon_seconds))
+            self.reap()
+
+    def info(self):
+        """
+        Returns the number of jobs per state.
+        """
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
@@ -0,0 +1,224 @@
+"""
+Precomputed optimal plans for every club and every tournament.
+
+`python plans.py` solves, for each club and each tournament in the games data, the query over the
+whole date range for a few (live, highlight) preference values, and writes the optimal plans
+together with the coverage table of the catalog (see `coverage.py`) into one compressed NumPy
+archive. The app loads it at startup: single-club queries over the whole date range are answered
+from the table, and all other queries are preprocessed with its coverage table instead of building
+one from the offers.
+
+The file is only used while none of the data files it has been computed from changed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+import warnings
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from datastore import DATA_DIR, SOURCES, STORE_DIR
+from coverage import CoverageTable
+from presolve import optimize_with_presolve
+from batch import run_batch
+
+PLANS_FILE = os.path.join(STORE_DIR, 'plans.npz')
+# Data files the plans depend on
+PLAN_SOURCES = ("games", "offers", "packages")
+# (live, highlight) preference values in percent; 10/20 are the defaults of the frontend
+DEFAULT_VALUES = [(0, 0), (10, 20)]
+EPOCH = date(1970, 1, 1)
+
+
+def _source_mtimes(data_dir=DATA_DIR):
+    return {table: os.path.getmtime(os.path.join(data_dir, SOURCES[table])) for table in PLAN_SOURCES}
+
+
+class PlanTable:
+    """
+    Optimal plans by (kind, name, live value, highlight value), with kind "club" or "tournament"
+    and the preference values in percent, plus the coverage table of the catalog.
+    """
+
+    def __init__(self, coverage, plans, sources):
+        self.coverage = coverage
+        self.plans = plans
+        self.sources = sources
+        self._checked = None
+
+    def plan(self, kind, name, live_value, highlight_value):
+        """
+        Returns the optimization results of a precomputed plan (like `optimize_with_presolve`,
+        without presolve statistics), or None if there is none.
+        """
+        plan = self.plans.get((kind, name, live_value, highlight_value))
+        if plan is None:
+            return None
+        active = {"month": [], "year": []}
+        for sub_type, package, day in plan["subscriptions"]:
+            active[sub_type].append({"package": package, "start_date": EPOCH + timedelta(days=day)})
+        return {
+            "status": plan["status"],
+            "granularity": "day",
+            "same_as_daily": True,
+            "active_monthly_subscriptions": active["month"],
+            "active_yearly_subscriptions": active["year"],
+            "objective_value": plan["objective_value"],
+            "lower_bound": plan["lower_bound"],
+            "optimality_gap": 0.0,
+        }
+
+    def valid_for(self, snapshot, data_dir=DATA_DIR):
+        """
+        Checks that the data files didn't change since the plans were computed. The result is
+        remembered per catalog snapshot, which is replaced whenever the files change.
+        """
+        if snapshot is None or self._checked is not snapshot:
+            try:
+                current = _source_mtimes(data_dir)
+            except OSError:
+                return False
+            if any(current[table] > self.sources[table] for table in PLAN_SOURCES):
+                return False
+            self._checked = snapshot
+        return True
+
+    def save(self, path=PLANS_FILE):
+        """
+        Writes the table as a compressed NumPy archive: the coverage arrays, the subscriptions of
+        all plans in flat arrays and a JSON header with the plan keys and values.
+        """
+        keys = sorted(self.plans)
+        offsets = np.cumsum([0] + [len(self.plans[key]["subscriptions"]) for key in keys])
+        subscriptions = [s for key in keys for s in self.plans[key]["subscriptions"]]
+        header = {
+            "sources": self.sources,
+            "plans": [[*key, self.plans[key]["status"], self.plans[key]["objective_value"],
+                       self.plans[key]["lower_bound"]] for key in keys],
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            header=np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8),
+            plan_offsets=offsets.astype(np.int64),
+            yearly=np.array([s[0] == "year" for s in subscriptions], dtype=bool),
+            package=np.array([s[1] for s in subscriptions], dtype=np.int64),
+            day=np.array([s[2] for s in subscriptions], dtype=np.int32),
+            **self.coverage.arrays(),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=PLANS_FILE):
+        with np.load(path) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+        header = json.loads(arrays["header"].tobytes().decode('utf-8'))
+        offsets = arrays["plan_offsets"].tolist()
+        yearly, packages, days = arrays["yearly"].tolist(), arrays["package"].tolist(), arrays["day"].tolist()
+        plans = {}
+        for i, (kind, name, live, highlight, status, objective, lower_bound) in enumerate(header["plans"]):
+            plans[kind, name, live, highlight] = {
+                "status": status,
+                "objective_value": objective,
+                "lower_bound": lower_bound,
+                "subscriptions": [("year" if yearly[j] else "month", packages[j], days[j])
+                                  for j in range(offsets[i], offsets[i + 1])],
+            }
+        return cls(CoverageTable.from_arrays(arrays), plans, header["sources"])
+
+
+def load_plans(path=PLANS_FILE, data_dir=DATA_DIR):
+    """
+    Returns the plan table if the file exists and is up to date, else None.
+    """
+    try:
+        table = PlanTable.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return table if table.valid_for(None, data_dir) else None
+
+
+def precompute(games_df, offers, packages, values=DEFAULT_VALUES, workers=None, progress=None):
+    """
+    Computes the optimal plan of every club and every tournament over the whole date range.
+
+    Parameters:
+        games_df (pd.DataFrame): All games.
+        offers (pd.DataFrame): All streaming offers.
+        packages (pd.DataFrame): All streaming packages.
+        values (list): (live, highlight) preference values in percent.
+        workers (int, optional): Plans computed at the same time (see `batch.run_batch`).
+        progress (callable, optional): Called with the number of finished and of all plans.
+
+    Returns:
+        tuple: The coverage table (CoverageTable) and the plans (dict): (kind, name, live,
+        highlight) -> plan; only proven optimal plans are kept.
+    """
+    coverage = CoverageTable.from_data(games_df, offers, packages)
+    groups = {}
+    for club in pd.unique(games_df[['team_home', 'team_away']].values.ravel()).tolist():
+        groups["club", club] = games_df['id'][(games_df['team_home'] == club) | (games_df['team_away'] == club)]
+    for tournament in games_df['tournament_name'].unique().tolist():
+        groups["tournament", tournament] = games_df['id'][games_df['tournament_name'] == tournament]
+    queries = [(kind, name, live, highlight) for (kind, name) in groups for live, highlight in values]
+
+    def solve(query):
+        kind, name, live, highlight = query
+        p = coverage.preprocess(groups[kind, name].tolist(), live / 100, highlight / 100)
+        if not p['packages']:
+            return None, 404
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = optimize_with_presolve(*[p[k] for k in ('packages', 'games', 'game_dates', 'C_month', 'C_year', 'P_g')],
+                                             preferences=p['preferences'])
+        return results, 200
+
+    plans = {}
+    for done, answer in enumerate(run_batch(queries, solve, workers), start=1):
+        results = answer.get("result")
+        if results is not None and results['status'] == "Optimal":
+            subscriptions = [(sub_type, int(s["package"]), (s["start_date"] - EPOCH).days)
+                             for sub_type in ("month", "year") for s in results[f"active_{sub_type}ly_subscriptions"]]
+            plans[queries[answer["index"]]] = {
+                "status": results['status'],
+                "objective_value": results['objective_value'],
+                "lower_bound": results['lower_bound'],
+                "subscriptions": subscriptions,
+            }
+        if progress is not None:
+            progress(done, len(queries))
+    return coverage, plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', nargs='+', default=[f"{live}:{highlight}" for live, highlight in DEFAULT_VALUES],
+                        help='live:highlight preference values in percent to precompute (e.g. 0:0 10:20).')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory with the CSV files.')
+    parser.add_argument('--output', default=PLANS_FILE, help='File to write the plans to.')
+    parser.add_argument('--workers', type=int, help='Plans computed at the same time (default: CPU count).')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    values = [tuple(int(v) for v in value.split(':')) for value in args.values]
+
+    start = time.perf_counter()
+    sources = _source_mtimes(args.data_dir)
+    games_df = pd.read_csv(os.path.join(args.data_dir, SOURCES["games"]))
+    offers = pd.read_csv(os.path.join(args.data_dir, SOURCES["offers"]))
+    packages = pd.read_csv(os.path.join(args.data_dir, SOURCES["packages"]))
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"{done}/{total} plans, {time.perf_counter() - start:.1f}s", flush=True)
+
+    coverage, plans = precompute(games_df, offers, packages, values, args.workers, progress)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    PlanTable(coverage, plans, sources).save(args.output)
+    print(f"{len(plans)} optimal plans written to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
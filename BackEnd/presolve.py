@@ -0,0 +1,296 @@
+import time
+import numpy as np
+from coverage import incidence_matrix
+from streaming_optimizer import (MONTH_WINDOW, YEAR_WINDOW, GRANULARITY_SPANS, choose_granularity,
+                                 bucket_start_dates, optimize_streaming_packages, request_deadline)
+from tracing import span
+
+# Subscription types with their window length and the +1/+12 activation cost the model adds
+SUBSCRIPTION_TYPES = {
+    "month": (MONTH_WINDOW, 1),
+    "year": (YEAR_WINDOW, 12),
+}
+
+
+def _free_subscriptions(free_games, game_dates, P_g, free_options):
+    """
+    Covers the free games with zero-cost subscriptions.
+
+    Every game is assigned greedily to the free option that covers the most still unassigned
+    free games, then the games of each option are covered with as few windows as possible by
+    starting a subscription at the first uncovered game.
+
+    Returns:
+        tuple: Lists of monthly and yearly subscription dictionaries ("package", "start_date").
+    """
+    unassigned = set(free_games)
+    assignment = {}
+    while unassigned:
+        counts = {}
+        for g in (g for g in free_games if g in unassigned):
+            for option in free_options:
+                if option[1] in P_g[g]:
+                    counts[option] = counts.get(option, 0) + 1
+        best = max(counts, key=lambda option: (counts[option], option[0] == "year"))
+        assigned = [g for g in free_games if g in unassigned and best[1] in P_g[g]]
+        assignment[best] = assigned
+        unassigned.difference_update(assigned)
+
+    subscriptions = {"month": [], "year": []}
+    for (sub_type, p), assigned in assignment.items():
+        window = SUBSCRIPTION_TYPES[sub_type][0]
+        covered_until = None
+        for d in sorted(game_dates[g] for g in assigned):
+            if covered_until is None or d > covered_until:
+                subscriptions[sub_type].append({"package": p, "start_date": d})
+                covered_until = d + window
+    return subscriptions["month"], subscriptions["year"]
+
+
+def _non_dominated_starts(start_times, option_times, window):
+    """
+    Keeps the start dates whose covered games are not a subset of another start date's games.
+
+    A start date d covers the games option_times[a:b] with a = first game >= d and
+    b = first game > d + window. Both bounds never decrease with d, so among start dates with
+    the same `a` the last one covers the most, and among the remaining ones a start date with
+    the same `b` as its predecessor covers a subset of the predecessor's games.
+
+    Returns:
+        tuple: Indices of the kept start dates and their (a, b) ranges.
+    """
+    a = np.searchsorted(option_times, start_times, side='left')
+    b = np.searchsorted(option_times, start_times + np.timedelta64(window), side='right')
+    kept = np.flatnonzero(a < b)
+    # Last start date per distinct `a`
+    kept = kept[np.append(a[kept][1:] != a[kept][:-1], True)]
+    # First start date per distinct `b`
+    kept = kept[np.insert(b[kept][1:] != b[kept][:-1], 0, True)]
+    return kept, a[kept], b[kept]
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def presolve(packages, games, game_dates, C_month, C_year, P_g, granularity="day", preferences=None, monitor=None):
+    """
+    Shrinks the optimization problem before it is handed to the solver.
+
+    All reductions keep the optimal (penalized) cost of the model:
+        1. Free games: Games that a package with price 0 can stream (with every preferred quality
+           some package offers for the game) are removed from the model and covered by zero-cost
+           subscriptions instead.
+        2. Dominated subscription options: A (package, monthly/yearly) option is dropped if another
+           option covers a superset of its games, and of the games it streams with each preferred
+           quality, with an at least as long window at a cost that is not higher (including the
+           activation costs the model adds).
+        3. Dominated start dates: A start date of an option is dropped if another start date of
+           the same option covers a superset of its games.
+        4. Components: Games that share no remaining variable are split into independent
+           components that can be solved one by one.
+
+    Parameters:
+        packages, games, game_dates, C_month, C_year, P_g: See `optimize_streaming_packages`.
+        granularity (str): "day", "week", "month" or "auto". The start dates are bucketed the same
+            way as in `optimize_streaming_packages`.
+        preferences (dict, optional): Live and highlight preferences (see `preprocess_data`).
+        monitor (progress.SolveMonitor, optional): Checked between the options, so a cancelled
+            optimization stops during the presolve.
+
+    Returns:
+        dict: A dictionary containing:
+            - "packages", "games", "game_dates", "C_month", "C_year", "P_g", "preferences": The reduced
+              problem (game_dates is left unchanged so that the start date buckets stay the same).
+            - "granularity" (str): The resolved granularity.
+            - "allowed_starts" (dict): Non-dominated start dates per subscription type and package.
+            - "components" (list): Lists of games that can be solved independently.
+            - "fixed_monthly_subscriptions" (list): Free monthly subscriptions covering the free games.
+            - "fixed_yearly_subscriptions" (list): Free yearly subscriptions covering the free games.
+            - "stats" (dict): Presolve statistics.
+    """
+    time_start = time.perf_counter()
+
+    if granularity == "auto":
+        granularity = choose_granularity(packages, game_dates)
+    if granularity not in GRANULARITY_SPANS:
+        raise ValueError(f"Unknown granularity '{granularity}'. Use one of: auto, {', '.join(GRANULARITY_SPANS)}.")
+    start_dates = bucket_start_dates(game_dates, granularity)
+    start_times = np.array(start_dates, dtype='datetime64[s]')
+
+    prices = {
+        "month": {p: C_month[p] for p in C_month if p in packages},
+        "year": {p: C_year[p] for p in C_year if p in packages},
+    }
+
+    preferences = preferences or {}
+
+    # Which priced package streams which game (games x packages), overall and per preference
+    package_list = [p for p in packages if p in prices["month"] or p in prices["year"]]
+    package_pos = {p: j for j, p in enumerate(package_list)}
+    covers = incidence_matrix(games, package_list, P_g)
+    preferred_covers = [incidence_matrix(games, package_list, preference["P_g"])
+                        for _, preference in sorted(preferences.items())]
+
+    ### Step 1: Fix games that a free package can stream
+    free_options = [(sub_type, p) for sub_type in prices for p, cost in prices[sub_type].items() if cost == 0]
+    free_mask = np.zeros(len(package_list), dtype=bool)
+    free_mask[[package_pos[p] for _, p in free_options]] = True
+    # Free packages that stream the game with every preferred quality a priced package offers for it
+    good = covers & free_mask
+    for preferred in preferred_covers:
+        good &= np.where(preferred.any(axis=1, keepdims=True), preferred, True)
+    is_free = good.any(axis=1)
+    free_games = [g for g, free in zip(games, is_free.tolist()) if free]
+    free_P_g = {g: [package_list[j] for j in np.flatnonzero(good[i]).tolist()]
+                for i, g in enumerate(games) if is_free[i]}
+    fixed_monthly, fixed_yearly = _free_subscriptions(free_games, game_dates, free_P_g, free_options)
+    remaining = np.flatnonzero(~is_free)
+    remaining_games = [games[i] for i in remaining.tolist()]
+    remaining_covers = covers[remaining]
+
+    ### Step 2: Drop dominated subscription options
+    # Games of every package packed to bits (packages x bytes), overall and per preference
+    bits = np.packbits(remaining_covers.T, axis=1)
+    preferred_bits = np.stack([np.packbits(preferred[remaining].T, axis=1) for preferred in preferred_covers], axis=1) \
+        if preferred_covers else np.zeros((len(package_list), 0, bits.shape[1]), dtype=np.uint8)
+    counts = remaining_covers.sum(axis=0)
+    options = [(cost + activation_cost, window, package_pos[p], sub_type, p)
+               for sub_type, (window, activation_cost) in SUBSCRIPTION_TYPES.items()
+               for p, cost in prices[sub_type].items() if counts[package_pos[p]]]
+    # Potential dominators first: cheaper, then longer window, then more games
+    options.sort(key=lambda o: (o[0], -o[1], -counts[o[2]]))
+    kept_options = []
+    kept_windows = np.zeros(len(options), dtype=np.int64)
+    kept_bits = np.zeros((len(options), bits.shape[1]), dtype=np.uint8)
+    kept_preferred = np.zeros((len(options), *preferred_bits.shape[1:]), dtype=np.uint8)
+    for cost, window, j, sub_type, p in options:
+        if monitor is not None:
+            monitor.check()
+        n = len(kept_options)
+        dominated = ((kept_windows[:n] >= window.days)
+                     & np.all(kept_bits[:n] & bits[j] == bits[j], axis=1)
+                     & np.all(kept_preferred[:n] & preferred_bits[j] == preferred_bits[j], axis=(1, 2)))
+        if not dominated.any():
+            kept_windows[n], kept_bits[n], kept_preferred[n] = window.days, bits[j], preferred_bits[j]
+            kept_options.append((cost, window, j, sub_type, p))
+
+    ### Step 3: Drop dominated start dates and link the games that share a variable
+    game_pos = {g: i for i, g in enumerate(remaining_games)}
+    game_times = np.array([game_dates[g] for g in remaining_games], dtype='datetime64[s]')
+    parent = list(range(len(remaining_games)))
+    allowed_starts = {"month": {}, "year": {}}
+    variables_after = 0
+    for _, window, j, sub_type, p in kept_options:
+        if monitor is not None:
+            monitor.check()
+        option_games = np.flatnonzero(remaining_covers[:, j])
+        order = np.argsort(game_times[option_games], kind='stable')
+        option_games = option_games[order]
+        kept, a, b = _non_dominated_starts(start_times, game_times[option_games], window)
+        allowed_starts[sub_type][p] = [start_dates[i] for i in kept.tolist()]
+        variables_after += len(kept)
+
+        # Games covered by the same variable end up in the same component:
+        # link every game with its successor inside each [a, b) range
+        linked = np.zeros(len(option_games) + 1, dtype=np.int64)
+        np.add.at(linked, a, 1)
+        np.add.at(linked, b - 1, -1)
+        for k in np.flatnonzero(np.cumsum(linked)[:-1] > 0).tolist():
+            root_a, root_b = _find(parent, option_games[k]), _find(parent, option_games[k + 1])
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    ### Step 4: Collect the components
+    components = {}
+    for g in remaining_games:
+        components.setdefault(_find(parent, game_pos[g]), []).append(g)
+
+    # Size of the model without presolve (variables that cover at least one game)
+    all_times = np.array([game_dates[g] for g in games], dtype='datetime64[s]')
+    variables_before = 0
+    for sub_type, (window, _) in SUBSCRIPTION_TYPES.items():
+        for p in prices[sub_type]:
+            option_times = np.sort(all_times[covers[:, package_pos[p]]])
+            a = np.searchsorted(option_times, start_times, side='left')
+            b = np.searchsorted(option_times, start_times + np.timedelta64(window), side='right')
+            variables_before += int(np.count_nonzero(a < b))
+
+    kept_packages = {p for _, _, _, _, p in kept_options}
+    result = {
+        "packages": [p for p in packages if p in kept_packages],
+        "games": remaining_games,
+        "game_dates": game_dates,
+        "C_month": {p: c for p, c in prices["month"].items() if p in allowed_starts["month"]},
+        "C_year": {p: c for p, c in prices["year"].items() if p in allowed_starts["year"]},
+        "P_g": {g: [p for p in P_g[g] if p in kept_packages] for g in remaining_games},
+        "preferences": {
+            name: {
+                "weight": preference["weight"],
+                "P_g": {g: [p for p in preference["P_g"][g] if p in kept_packages]
+                        for g in remaining_games if g in preference["P_g"]},
+            }
+            for name, preference in preferences.items()
+        },
+        "granularity": granularity,
+        "allowed_starts": allowed_starts,
+        "components": list(components.values()),
+        "fixed_monthly_subscriptions": fixed_monthly,
+        "fixed_yearly_subscriptions": fixed_yearly,
+        "stats": {
+            "variables_before": variables_before,
+            "variables_removed": variables_before - variables_after,
+            "constraints_before": len(games),
+            "constraints_removed": len(free_games),
+            "free_games": len(free_games),
+            "options_removed": len(options) - len(kept_options),
+            "components": len(components),
+            "time_ms": round((time.perf_counter() - time_start) * 1000, 2),
+        },
+    }
+    return result
+
+
+def optimize_with_presolve(packages, games, game_dates, C_month, C_year, P_g, granularity="day",
+                           solver="mip", warm_start=False, monitor=None, limits=None, preferences=None,
+                           initial=None, component_cache=None, deadline=None):
+    """
+    Presolves the problem, optimizes the reduced problem and adds the fixed free subscriptions.
+
+    Drop-in replacement for `optimize_streaming_packages` with the same parameters; the deadline
+    defaults to the numeric time limit from before the presolve.
+
+    Returns:
+        dict: Optimization results like `optimize_streaming_packages`, plus "presolve" (dict) with
+        the presolve statistics.
+    """
+    if deadline is None:
+        deadline = request_deadline(limits)
+    with span("presolve"):
+        presolved = presolve(packages, games, game_dates, C_month, C_year, P_g, granularity, preferences, monitor)
+    results = optimize_streaming_packages(
+        presolved['packages'],
+        presolved['games'],
+        presolved['game_dates'],
+        presolved['C_month'],
+        presolved['C_year'],
+        presolved['P_g'],
+        granularity=presolved['granularity'],
+        allowed_starts=presolved['allowed_starts'],
+        components=presolved['components'],
+        solver=solver,
+        warm_start=warm_start,
+        monitor=monitor,
+        limits=limits,
+        preferences=presolved['preferences'],
+        initial=initial,
+        component_cache=component_cache,
+        deadline=deadline
+    )
+    results["active_monthly_subscriptions"].extend(presolved["fixed_monthly_subscriptions"])
+    results["active_yearly_subscriptions"].extend(presolved["fixed_yearly_subscriptions"])
+    results["presolve"] = presolved["stats"]
+    return results
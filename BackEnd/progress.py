@@ -0,0 +1,185 @@
+import os
+import re
+import subprocess
+import threading
+import time
+import pulp
+
+# CBC log lines that carry progress information
+INCUMBENT_LINE = re.compile(r'^Cbc00(?:04|12)I Integer solution of (\S+)')
+NODE_LINE = re.compile(r'^Cbc0010I After \d+ nodes, \d+ on tree, (\S+) best solution, best possible (\S+)')
+ROOT_LINE = re.compile(r'^Cbc0013I At root node, .* to (\S+) in')
+RELAXATION_LINE = re.compile(r'^Continuous objective value is (\S+)')
+PARTIAL_LINE = re.compile(r'^Cbc0005I Partial search - best objective (\S+) \(best possible (\S+)\)')
+COMPLETED_LINE = re.compile(r'^Cbc0001I Search completed - best objective (\S+),')
+# Printed after a search that stopped within the gap tolerance
+LOWER_BOUND_LINE = re.compile(r'^Lower bound:\s+(\S+)')
+NODES_LINE = re.compile(r'^Enumerated nodes:\s+(\d+)')
+
+# CBC logs objective values and bounds with about 6 significant digits, so a logged bound matches
+# the exact objective of the solution only up to this relative difference
+BOUND_TOLERANCE = 1e-5
+
+
+class Cancelled(Exception):
+    """
+    Raised by a solve whose monitor has been cancelled.
+    """
+
+
+class SolveMonitor:
+    """
+    Connects a running optimization with the outside: it collects progress reports from the solver
+    and can cancel the optimization, killing a running CBC process.
+
+    Parameters:
+        report (callable): Called with a progress dictionary ("solve", "incumbent", "bound",
+            "elapsed") whenever CBC finds a better solution or bound.
+    """
+
+    def __init__(self, report=None):
+        self.report = report
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self.solves = 0
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Raises Cancelled if the optimization has been cancelled.
+        """
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def cancel(self):
+        """
+        Cancels the optimization and kills the CBC processes it is waiting for.
+        """
+        self.cancelled.set()
+        with self._lock:
+            for process in self._processes:
+                process.kill()
+
+    def start_solve(self, process):
+        with self._lock:
+            self.solves += 1
+            self._processes.add(process)
+            solve = self.solves
+        # Cancelled between the check and the start of the process
+        if self.cancelled.is_set():
+            process.kill()
+        return solve
+
+    def end_solve(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def progress(self, solve, incumbent, bound):
+        if self.report is not None:
+            self.report({
+                "solve": solve,
+                "incumbent": incumbent,
+                "bound": bound,
+                "elapsed": round(time.monotonic() - self.started, 3),
+            })
+
+
+class MonitoredCBC(pulp.PULP_CBC_CMD):
+    """
+    PULP_CBC_CMD that reads the CBC log while it runs: progress goes to a `SolveMonitor`, which can
+    also kill the process.
+
+    After the solve, `incumbent` and `bound` hold the last objective value and bound CBC reported,
+    so the gap of a search that stopped early (time limit, gap tolerance) is known, and `nodes` the
+    number of branch and bound nodes.
+
+    Only MPS-based solves (the PuLP default) are supported.
+
+    `solve_CBC` replaces the one of PuLP's CBC driver and uses its internal helpers
+    (`create_tmp_files`, `writesol`, `getOptions`, `readsol_MPS`, `delete_tmp_files`), which are
+    not part of PuLP's public API. requirements.txt pins the PuLP versions it has been checked with
+    (2.6 to 3.3); check this method again before widening the range.
+    """
+
+    def __init__(self, monitor=None, **kwargs):
+        super().__init__(**kwargs)
+        self.monitor = monitor if monitor is not None else SolveMonitor()
+        self.incumbent = None
+        self.bound = None
+        self.nodes = None
+
+    def solve_CBC(self, lp, use_mps=True):
+        self.monitor.check()
+        tmpMps, tmpSol, tmpMst = self.create_tmp_files(lp.name, "mps", "sol", "mst")
+        vs, variablesNames, constraintsNames, _ = lp.writeMPS(tmpMps, rename=1)
+        args = [self.path, tmpMps]
+        if lp.sense == pulp.LpMaximize:
+            args.append("-max")
+        if self.optionsDict.get("warmStart", False):
+            self.writesol(tmpMst, lp, vs, variablesNames, constraintsNames)
+            args += ["-mips", tmpMst]
+        if self.timeLimit is not None:
+            args += ["-sec", str(self.timeLimit)]
+        for option in self.options + self.getOptions():
+            args += ("-" + option).split()
+        args += ["-solve", "-printingOptions", "all", "-solution", tmpSol]
+
+        # CBC prints minimization objectives, a maximized objective shows up negated
+        sign = -1 if lp.sense == pulp.LpMaximize else 1
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, text=True)
+        solve = self.monitor.start_solve(process)
+        incumbent, bound = None, None
+        self.nodes = None
+        try:
+            for line in process.stdout:
+                if self.msg:
+                    print(line, end='')
+                if match := NODES_LINE.match(line):
+                    self.nodes = int(match.group(1))
+                    continue
+                if match := INCUMBENT_LINE.match(line):
+                    incumbent = sign * float(match.group(1))
+                elif match := NODE_LINE.match(line):
+                    incumbent, bound = sign * float(match.group(1)), sign * float(match.group(2))
+                elif match := ROOT_LINE.match(line):
+                    bound = sign * float(match.group(1))
+                elif match := RELAXATION_LINE.match(line):
+                    bound = float(match.group(1))
+                elif match := PARTIAL_LINE.match(line):
+                    incumbent, bound = sign * float(match.group(1)), sign * float(match.group(2))
+                elif match := COMPLETED_LINE.match(line):
+                    incumbent = bound = sign * float(match.group(1))
+                elif match := LOWER_BOUND_LINE.match(line):
+                    bound = sign * float(match.group(1))
+                else:
+                    continue
+                self.monitor.progress(solve, incumbent, bound)
+            return_code = process.wait()
+        finally:
+            process.stdout.close()
+            self.monitor.end_solve(process)
+        self.incumbent, self.bound = incumbent, bound
+
+        if self.monitor.cancelled.is_set():
+            self.delete_tmp_files(tmpMps, tmpSol, tmpMst)
+            raise Cancelled()
+        if return_code != 0 or not os.path.exists(tmpSol):
+            raise pulp.PulpSolverError("Pulp: Error while executing " + self.path)
+        status, values, reducedCosts, shadowPrices, slacks, sol_status = \
+            self.readsol_MPS(tmpSol, lp, vs, variablesNames, constraintsNames)
+        lp.assignVarsVals(values)
+        lp.assignVarsDj(reducedCosts)
+        lp.assignConsPi(shadowPrices)
+        lp.assignConsSlack(slacks, activity=True)
+        lp.assignStatus(status, sol_status)
+        self.delete_tmp_files(tmpMps, tmpSol, tmpMst)
+        return status
+
+
+def cbc_solver(monitor=None, **kwargs):
+    """
+    Returns the CBC command for a solve; `kwargs` are PULP_CBC_CMD options (timeLimit, gapRel, threads, ...).
+    """
+    return MonitoredCBC(monitor, **kwargs)
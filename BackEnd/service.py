@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from datetime import timedelta, datetime
 
@@ -10,7 +11,7 @@ def load_freeTV():
 def load_streaming_data():
     return pd.read_csv('data/bc_streaming_offer.csv'), pd.read_csv('data/bc_streaming_package.csv')
 
-def filter_games(games_df, clubs, start_date, end_date):
+def filter_games(games_df, clubs, start_date, end_date, index=None):
     """
     Filters games based on the provided clubs and timespan.
 
@@ -19,10 +20,15 @@ def filter_games(games_df, clubs, start_date, end_date):
         clubs (list): List of club names to filter by.
         start_date (str): Start date for the timespan filter.
         end_date (str): End date for the timespan filter.
+        index (GameIndex): Prebuilt index over games_df (see `game_index.GameIndex`). Without it
+            the whole DataFrame is scanned.
 
     Returns:
         pd.DataFrame: Filtered DataFrame of games.
     """
+    if index is not None:
+        return games_df.iloc[index.search(clubs=clubs, start_date=start_date, end_date=end_date)]
+
     filtered_games = games_df[
         ((games_df['team_home'].isin(clubs)) | (games_df['team_away'].isin(clubs)))
     ]
@@ -34,68 +40,78 @@ def filter_games(games_df, clubs, start_date, end_date):
 
     return filtered_games
 
-def add_package_coverage(filtered_games, optimization_results, streaming_offers, streaming_packages):
+def add_package_coverage(filtered_games, optimization_results, streaming_offers, package_records):
     """
     Adds package coverage information to the filtered games.
 
+    The coverage is computed with one interval join: the offers of the active packages are sorted
+    by package and kick-off, so the offers a subscription covers are a contiguous range that is
+    found with a binary search. The work is linear in the number of (game, subscription) pairs,
+    and the package information is built once per package and live/highlights combination.
+
     Parameters:
         filtered_games (pd.DataFrame): DataFrame of filtered games.
         optimization_results (dict): Optimization results containing active subscriptions.
-        streaming_offers (pd.DataFrame): DataFrame of streaming offers.
+        streaming_offers (pd.DataFrame): DataFrame of streaming offers (only the offers of the filtered games are needed).
+        package_records (dict): Dictionary mapping package IDs to their package row (see `CatalogSnapshot.package_records`).
 
     Returns:
         tuple: A tuple containing:
             - list: List of filtered games with additional information about which packages cover the game.
+              Games covered by the same package with the same flags share the package dictionary.
             - str: Start date of the first game in the list.
             - str: End date of the last game in the list.
     """
-    # Extract active subscriptions
-    active_monthly_subscriptions = optimization_results.get("active_monthly_subscriptions", [])
-    active_yearly_subscriptions = optimization_results.get("active_yearly_subscriptions", [])
-
-    # Create a dictionary to map game IDs to the packages that cover them
-    game_coverage = {game_id: [] for game_id in filtered_games['id'].tolist()}
+    # Extract active subscriptions: monthly ones first, like they are listed in the coverage
+    subscriptions = [(sub['package'], sub['start_date'], 30)
+                     for sub in optimization_results.get("active_monthly_subscriptions", [])]
+    subscriptions += [(sub['package'], sub['start_date'], 365)
+                      for sub in optimization_results.get("active_yearly_subscriptions", [])]
 
     # Convert 'starts_at' to datetime if it's not already
-    filtered_games['starts_at'] = pd.to_datetime(filtered_games['starts_at'])
-
-    # Function to get live and highlights information
-    def get_live_highlights(game_id, package_id, packages):
-        offer = streaming_offers[(streaming_offers['game_id'] == game_id) & (streaming_offers['streaming_package_id'] == package_id)]
-        if not offer.empty:
-            package_info = packages[packages['id'] == package_id].iloc[0].to_dict()
+    filtered_games = filtered_games.assign(starts_at=pd.to_datetime(filtered_games['starts_at']))
+
+    ### Step 1: Join the offers of the active packages with the kick-off times of their games
+    active_packages = {package for package, _, _ in subscriptions}
+    offers = streaming_offers[streaming_offers['streaming_package_id'].isin(active_packages)] \
+        .drop_duplicates(subset=['game_id', 'streaming_package_id'], keep='last')
+    offers = offers[['game_id', 'streaming_package_id', 'live', 'highlights']].merge(
+        filtered_games[['id', 'starts_at']], left_on='game_id', right_on='id') \
+        .sort_values(['streaming_package_id', 'starts_at'], kind='stable')
+    offer_packages = offers['streaming_package_id'].to_numpy()
+    offer_times = offers['starts_at'].to_numpy()
+
+    ### Step 2: Find the offers each subscription covers (start_date <= starts_at <= start_date + window)
+    ranges = []
+    for package, start_date, window in subscriptions:
+        block_lo = np.searchsorted(offer_packages, package, side='left')
+        block_hi = np.searchsorted(offer_packages, package, side='right')
+        block = offer_times[block_lo:block_hi]
+        start_date = pd.Timestamp(start_date)
+        lo = np.searchsorted(block, start_date.to_datetime64(), side='left')
+        hi = np.searchsorted(block, (start_date + timedelta(days=window)).to_datetime64(), side='right')
+        ranges.append(np.arange(block_lo + lo, block_lo + hi))
+    covered = np.concatenate(ranges) if ranges else np.array([], dtype=np.int64)
+
+    ### Step 3: Collect the coverage per game, in subscription order
+    game_coverage = {game_id: [] for game_id in filtered_games['id'].tolist()}
+    package_infos = {}
+    for game_id, package_id, live, highlights in zip(
+            offers['game_id'].to_numpy()[covered].tolist(), offer_packages[covered].tolist(),
+            offers['live'].to_numpy()[covered].tolist(), offers['highlights'].to_numpy()[covered].tolist()):
+        package_info = package_infos.get((package_id, live, highlights))
+        if package_info is None:
+            package_info = dict(package_records[package_id])
             package_info.update({
-                'live': offer.iloc[0]['live'].tolist(),
-                'highlights': offer.iloc[0]['highlights'].tolist()
+                'live': live,
+                'highlights': highlights
             })
-            return package_info
-        return None
-
-    # Add monthly subscriptions to the coverage
-    for sub in active_monthly_subscriptions:
-        package = sub['package']
-        start_date = pd.to_datetime(sub['start_date'])
-        end_date = start_date + timedelta(days=30)
-        covered_games = filtered_games[(filtered_games['starts_at'] >= start_date) & (filtered_games['starts_at'] <= end_date)]
-        for game_id in covered_games['id'].tolist():
-            coverage_info = get_live_highlights(game_id, package, streaming_packages)
-            if coverage_info:
-                game_coverage[game_id].append(coverage_info)
-
-    # Add yearly subscriptions to the coverage
-    for sub in active_yearly_subscriptions:
-        package = sub['package']
-        start_date = pd.to_datetime(sub['start_date'])
-        end_date = start_date + timedelta(days=365)
-        covered_games = filtered_games[(filtered_games['starts_at'] >= start_date) & (filtered_games['starts_at'] <= end_date)]
-        for game_id in covered_games['id'].tolist():
-            coverage_info = get_live_highlights(game_id, package, streaming_packages)
-            if coverage_info:
-                game_coverage[game_id].append(coverage_info)
+            package_infos[package_id, live, highlights] = package_info
+        game_coverage[game_id].append(package_info)
 
     # Add coverage information to the filtered games
     filtered_games_with_coverage = filtered_games.copy()
-    filtered_games_with_coverage['covered_by'] = filtered_games_with_coverage['id'].apply(lambda x: game_coverage[x])
+    filtered_games_with_coverage['covered_by'] = [game_coverage[x] for x in filtered_games['id'].tolist()]
 
     # Sort the filtered games by 'starts_at' in ascending order
     filtered_games_with_coverage = filtered_games_with_coverage.sort_values(by='starts_at')
@@ -106,12 +122,12 @@ def add_package_coverage(filtered_games, optimization_results, streaming_offers,
 
     return filtered_games_with_coverage.to_dict(orient='records'), start_date, end_date
 
-def get_subscription_details(packages_df, yearly_subscriptions, monthly_subscriptions):
+def get_subscription_details(package_records, yearly_subscriptions, monthly_subscriptions):
     """
     Processes the subscription lists and returns detailed information.
 
     Parameters:
-        packages_df (pd.DataFrame): DataFrame containing all package information.
+        package_records (dict): Dictionary mapping package IDs to their package row (see `CatalogSnapshot.package_records`).
         yearly_subscriptions (list): List of yearly subscription dictionaries.
         monthly_subscriptions (list): List of monthly subscription dictionaries.
 
@@ -126,7 +142,7 @@ def get_subscription_details(packages_df, yearly_subscriptions, monthly_subscrip
     for sub in yearly_subscriptions:
         package_id = sub["package"]
         start_date = pd.to_datetime(sub["start_date"])
-        package_row = packages_df[packages_df["id"] == package_id].iloc[0].to_dict()
+        package_row = dict(package_records[package_id])
         price = package_row["monthly_price_yearly_subscription_in_cents"]
         subscription_details.append({
             "package": package_row,
@@ -139,7 +155,7 @@ def get_subscription_details(packages_df, yearly_subscriptions, monthly_subscrip
     for sub in monthly_subscriptions:
         package_id = sub["package"]
         start_date = pd.to_datetime(sub["start_date"])
-        package_row = packages_df[packages_df["id"] == package_id].iloc[0].to_dict()
+        package_row = dict(package_records[package_id])
         price = package_row["monthly_price_cents"]
         subscription_details.append({
             "package": package_row,
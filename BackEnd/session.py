@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ComponentResults:
+    """
+    LRU store of optimal component results (see `optimize_streaming_packages`), keyed by `component_key`.
+    """
+
+    def __init__(self, max_results=64):
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+
+class OptimizationSession:
+    """
+    State that the queries of one user share while they tweak a query, e.g. add a club or move the
+    date range.
+
+    - Components: the optimal results of the independent components of earlier queries are kept,
+      so only the components the tweak changed are solved again (see `optimize_streaming_packages`).
+    - Warm start: CBC starts from the previous solution, completed for the new games.
+
+    Both are dropped when the catalog or a setting that changes the model (preference values,
+    granularity, solver, limits) changes.
+    """
+
+    def __init__(self, max_components=64):
+        self.max_components = max_components
+        self.last_access = time.monotonic()
+        self._lock = threading.Lock()
+        self._data = None
+        self._solve_settings = None
+        self._components = ComponentResults(max_components)
+        self._previous = None
+
+    def set_data(self, snapshot, live_value, highlight_value):
+        """
+        Records the catalog snapshot and the preference values of a query. The component results
+        and the previous solution are dropped when they change (see `solver_state`).
+        """
+        with self._lock:
+            self.last_access = time.monotonic()
+            self._data = (snapshot, live_value, highlight_value)
+
+    def solver_state(self, *settings):
+        """
+        Returns the component results and the previous solution (set of (type, package, start date))
+        for an optimization with the given settings (anything that changes the model besides the
+        games, e.g. granularity, solver and limits); both are reset when the settings changed.
+        """
+        with self._lock:
+            self.last_access = time.monotonic()
+            settings = (self._data, settings)
+            if settings != self._solve_settings:
+                self._solve_settings = settings
+                self._components = ComponentResults(self.max_components)
+                self._previous = None
+            return self._components, self._previous
+
+    def remember(self, results):
+        """
+        Keeps the subscriptions of a result to warm start the next optimization.
+        """
+        previous = {("month", s["package"], s["start_date"]) for s in results["active_monthly_subscriptions"]}
+        previous |= {("year", s["package"], s["start_date"]) for s in results["active_yearly_subscriptions"]}
+        with self._lock:
+            self._previous = previous
+
+
+class SessionStore:
+    """
+    Sessions by client-chosen ID. At most `max_sessions` are kept, the least recently used one is
+    dropped first, and sessions that haven't been used for `ttl` seconds expire.
+    """
+
+    def __init__(self, max_sessions=256, ttl=30 * 60):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        Returns the session with the given ID, starting a new one if there is none (or it expired).
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session.last_access > self.ttl:
+                session = OptimizationSession()
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            # Drop expired sessions from the old end
+            while self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest.last_access <= self.ttl:
+                    break
+                del self._sessions[oldest_id]
+            session.last_access = now
+            return session
+
+    def info(self):
+        with self._lock:
+            return {"sessions": len(self._sessions)}
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from streaming_optimizer import choose_granularity
+
+
+def _plain(value):
+    # NumPy scalars (e.g. package IDs from pandas) hash like their Python counterparts
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def problem_key(packages, games, game_dates, C_month, C_year, P_g, granularity="day", preferences=None, **options):
+    """
+    Computes a canonical hash of an optimization problem.
+
+    Game IDs are not part of the key: the solution only depends on the dates of the games and on
+    the packages that can stream them. Packages without a price can't be selected and are left out.
+    So different requests that reduce to the same model get the same key. The dates of the games
+    without offers count too: the start dates of a coarser granularity are bucketed over all game
+    dates (see `bucket_start_dates`).
+
+    Parameters:
+        packages, games, game_dates, C_month, C_year, P_g, granularity, preferences: See `optimize_streaming_packages`.
+        **options: Further settings that change the result (e.g. presolve=True).
+
+    Returns:
+        str: Hex digest identifying the problem.
+    """
+    if granularity == "auto":
+        granularity = choose_granularity(packages, game_dates)
+    package_set = set(packages)
+    month = {p: C_month[p] for p in C_month if p in package_set}
+    year = {p: C_year[p] for p in C_year if p in package_set}
+    priced = month.keys() | year.keys()
+    preferences = sorted((preferences or {}).items())
+
+    canonical = {
+        "month": sorted([_plain(p), float(c)] for p, c in month.items()),
+        "year": sorted([_plain(p), float(c)] for p, c in year.items()),
+        # Every game with its packages and the packages that stream it with each preferred quality
+        "games": sorted(
+            [game_dates[g].isoformat(), sorted(_plain(p) for p in P_g[g] if p in priced)] +
+            [sorted(_plain(p) for p in preference["P_g"].get(g, ()) if p in priced) for _, preference in preferences]
+            for g in games
+        ),
+        # All game dates, including the ones of games without offers
+        "dates": sorted({d.isoformat() for d in game_dates.values()}),
+        "preferences": [[name, float(preference["weight"])] for name, preference in preferences],
+        "granularity": granularity,
+        "options": {k: _plain(v) for k, v in options.items()},
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class SolutionCache:
+    """
+    LRU cache for optimization results with a TTL and a size bound in bytes.
+
+    Results are stored pickled, so callers always get their own copy and the size of an entry is
+    known exactly. If `directory` is set, entries are also written to disk there; they survive
+    restarts and are shared by all workers that use the same directory.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=24 * 60 * 60, directory=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else 4 * max_bytes
+        self._entries = OrderedDict()  # key -> (created, pickled result)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def _store(self, key, created, data):
+        # Caller holds the lock
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[1])
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = (created, data)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def _load_from_disk(self, key):
+        try:
+            path = self._path(key)
+            created = os.path.getmtime(path)
+            if time.time() - created > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return created, f.read()
+        except OSError:
+            return None
+
+    def _write_to_disk(self, key, data):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError as e:
+            print("Could not write solution cache entry:", e)
+
+    def _prune_disk(self):
+        # Drop expired files, then the oldest ones until the directory fits into max_disk_bytes
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.pickle'):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > self.ttl:
+                os.remove(entry.path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def get(self, key):
+        """
+        Returns a copy of the cached result for `key`, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._bytes -= len(self._entries.pop(key)[1])
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return pickle.loads(entry[1])
+
+        entry = self._load_from_disk(key) if self.directory else None
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._store(key, *entry)
+        return pickle.loads(entry[1])
+
+    def put(self, key, result):
+        """
+        Stores a result under `key`.
+        """
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, time.time(), data)
+        if self.directory:
+            self._write_to_disk(key, data)
+
+    def clear(self):
+        """
+        Removes all entries from memory (the disk entries are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self):
+        """
+        Returns the counters and the current size of the cache.
+        """
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": (self.stats["hits"] + self.stats["disk_hits"]) / lookups if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "persistent": bool(self.directory),
+            }
+
+
+class InFlight:
+    """
+    Lets concurrent optimizations of the same problem share one solve: the first caller of a key
+    solves it, callers that arrive while it runs wait for its result instead of starting another
+    CBC process.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, solve):
+        """
+        Returns the result of `solve()`, or of the running solve with the same key.
+
+        Returns:
+            tuple: The result (waiting callers get their own copy) and whether it came from another
+            caller's solve (bool).
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+        if not leader:
+            return pickle.loads(pickle.dumps(future.result())), True
+        try:
+            result = solve()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._futures[key]
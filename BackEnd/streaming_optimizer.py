@@ -1,6 +1,15 @@
+import bisect
+import multiprocessing
+import os
+import time
 import pulp
-import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from heuristic import heuristic_solution
+from coverage import CoverageTable, incidence_matrix
+from progress import BOUND_TOLERANCE, cbc_solver
+from tracing import span
 
 def print_solver_results(results):
     """
@@ -56,7 +65,8 @@ def preprocess_data(game_ids_of_interest, streaming_offers_raw, streaming_packag
         highlight_value (int): User's preference value for highlights.
 
     Returns:
-        dict: A dictionary containing:
+        dict: Only "packages" (empty) if no offer streams one of the games, else the input of the
+        optimization built from the coverage table of the offers (see `CoverageTable.preprocess`):
             - "packages" (list): List of relevant streaming package IDs.
             - "games" (list): List of game IDs with at least one streaming offer.
             - "game_dates" (dict): Dictionary mapping game IDs to their start dates (as `date` objects).
@@ -64,14 +74,14 @@ def preprocess_data(game_ids_of_interest, streaming_offers_raw, streaming_packag
             - "C_year" (dict): Dictionary mapping package IDs to yearly prices (12 * monthly yearly subscription price in cents).
             - "P_g" (dict): Dictionary mapping game IDs to the list of streaming package IDs that cover them.
             - "games_with_no_offers" (list): List of game IDs that have no streaming offers.
+            - "preferences" (dict): The live and highlight preferences (see `coverage.preference_weight`),
+              e.g. {"live": {"weight": 100.0, "P_g": {g: [p, ...]}}}, where P_g lists the packages
+              that stream a game live. Only preferences with a value > 0 are included.
     """
-    ## Preprocess data (minimize the size of data for optimization)
-    
 
     ### Step 1: Filter relevant packages
     # Identify package IDs that are relevant based on the offers for the selected games
     relevant_package_ids = streaming_offers_raw[streaming_offers_raw['game_id'].isin(game_ids_of_interest)]['streaming_package_id'].unique()
-    print("DEBUG: ", relevant_package_ids)
 
     # Check if there are no relevant packages
     if len(relevant_package_ids) <= 0:
@@ -79,113 +89,326 @@ def preprocess_data(game_ids_of_interest, streaming_offers_raw, streaming_packag
             "packages": relevant_package_ids,  # List of relevant package IDs
         }
         return result
-    
 
-    # Filter streaming packages to include only those relevant to the selected games
+    ### Step 2: Filter relevant games, offers and packages
+    games = games_df[games_df['id'].isin(game_ids_of_interest)]
+    filtered_offers = streaming_offers_raw[streaming_offers_raw['game_id'].isin(game_ids_of_interest)]
     filtered_packages = streaming_packages_raw[streaming_packages_raw['id'].isin(relevant_package_ids)]
 
-    # Compute yearly prices based on monthly price for yearly subscription and clean the dataframe
-    filtered_packages['yearly_price'] = filtered_packages['monthly_price_yearly_subscription_in_cents'] * 12
-    filtered_packages = filtered_packages.drop(columns=['monthly_price_yearly_subscription_in_cents'])
+    ### Step 3: Coverage bit matrices (games x packages) of all, live and highlight offers
+    coverage = CoverageTable.from_data(games, filtered_offers, filtered_packages)
 
-    ### Step 2: Filter relevant games and offers
-    # Filter games to include only those in the list of interest
-    games = games_df[games_df['id'].isin(game_ids_of_interest)]
+    ### Step 4: Extract the data for the solver; games with no offers are set aside
+    return coverage.preprocess(game_ids_of_interest, live_value, highlight_value, hard_filters=False)
 
-    # Filter offers to include only those for the games of interest
-    filtered_offers = streaming_offers_raw[streaming_offers_raw['game_id'].isin(game_ids_of_interest)]
 
-    ## if live_value >= 1: remove all packages that dont offer live
-    if live_value > 1:
-        # Get all packages that dont offer live
-        packages_no_live = filtered_offers[filtered_offers['live'] == 0]['streaming_package_id'].unique().tolist()
-        # Remove packages that dont offer live
-        filtered_packages = filtered_packages[~filtered_packages['id'].isin(packages_no_live)]
-
-
-    ### Step 3: Extract relevant data for the solver
-    # Extract unique package IDs
-    packages = filtered_packages['id'].unique().tolist()
-
-
-    # Create game_dates dictionary mapping game IDs to start dates
-    games.loc[:, 'starts_at'] = pd.to_datetime(games['starts_at'])  # Ensure dates are in datetime format
-    game_dates = games.set_index('id')['starts_at'].apply(lambda x: x.date()).to_dict()
-
-    # Create C_month dictionary: Maps package IDs to monthly prices (only for packages with a valid monthly price)
-    C_month = filtered_packages.dropna(subset=['monthly_price_cents']) \
-        .set_index('id')['monthly_price_cents'].to_dict()
-
-    # Create C_year dictionary: Maps package IDs to yearly prices (only for packages with a valid yearly price)
-    C_year = filtered_packages.dropna(subset=['yearly_price']) \
-        .set_index('id')['yearly_price'].to_dict()
-    
-    # This is like a hyperparameter
-    # 100 ** (5 * value) turned out to be a good sweet
-    def computePenalty(value):
-        return 100 ** (5 * value)
-    
-    if live_value > 0:
-        ### if a game is not offered live: increase package price
-        # Get all packages that dont offer live
-        packages_no_live = filtered_offers[filtered_offers['live'] == 0]['streaming_package_id'].unique().tolist()
-        # Increase the prices of packages that dont offer live
-        for p in packages_no_live:
-            if p in C_month:
-                C_month[p] += computePenalty(live_value)
-            if p in C_year:
-                C_year[p] += computePenalty(live_value) * 12
-                
-    if highlight_value > 0:
-        ### if a game is not offered highlight: increase package price
-        # Get all packages that dont offer highlight
-        packages_no_highlight = filtered_offers[filtered_offers['highlights'] == 0]['streaming_package_id'].unique().tolist()
-        # Increase the prices of packages that dont offer highlight
-        for p in packages_no_highlight:
-            if p in C_month:
-                C_month[p] += computePenalty(highlight_value)
-            if p in C_year:
-                C_year[p] +=  computePenalty(highlight_value) * 12
-
-
-    # Create P_g dictionary: Maps game IDs to the list of streaming package IDs that can stream the game
-    P_g = filtered_offers.groupby('game_id')['streaming_package_id'].apply(list).to_dict()
-
-    ### Step 4: Remove games with no offers
-    # Identify games from the input list that have no streaming offers
-    games_with_no_offers = [game_id for game_id in game_ids_of_interest if game_id not in P_g]
-
-    # Update the list of game IDs of interest to exclude those with no offers
-    game_ids_of_interest = [game_id for game_id in game_ids_of_interest if game_id in P_g]
-
-    ### Step 5: Return results
-    result = {
-        "packages": packages,  # List of relevant package IDs
-        "games": game_ids_of_interest,  # Games with at least one streaming offer
-        "game_dates": game_dates,  # Mapping of game IDs to their start dates
-        "C_month": C_month,  # Monthly prices for relevant packages
-        "C_year": C_year,  # Yearly prices for relevant packages
-        "P_g": P_g,  # Mapping of games to the packages that can stream them
-        "games_with_no_offers": games_with_no_offers  # Games with no streaming offers
-    }
+# Length of the subscription windows: a subscription started on day d covers [d, d + window]
+MONTH_WINDOW = timedelta(days=30)
+YEAR_WINDOW = timedelta(days=365)
+
+
+# Maximum distance between the first and the last game date of a start date bucket.
+# Every span is at most MONTH_WINDOW, so a subscription starting at the beginning of a bucket
+# covers all games of that bucket and the bucketed model stays feasible.
+GRANULARITY_SPANS = {
+    "day": timedelta(days=0),
+    "week": timedelta(days=6),
+    "month": timedelta(days=30),
+}
+
+# Limits on (number of packages * number of distinct game dates) used by granularity="auto"
+AUTO_DAY_LIMIT = 2000
+AUTO_WEEK_LIMIT = 8000
+
+# Independent components are solved in a process pool with this many workers (1 disables the pool).
+# Components with fewer games are solved in the calling process, a pool round trip isn't worth it.
+SOLVER_PROCESSES = int(os.environ.get('SOLVER_PROCESSES', os.cpu_count() or 1))
+PARALLEL_MIN_GAMES = 100
+
+_solver_pool = None
+
+SOLVERS = ("mip", "greedy")
 
-    return result
+# Used to report the worst status over all components
+STATUS_RANK = {"Optimal": 0, "Feasible": 1, "Heuristic": 1}
 
+# Server-wide CBC limits, each can be overridden per request (see `solver_limits`):
+#   time_limit: seconds for the whole optimization (see `request_deadline`), 0 for no limit, or "auto"
+#       for a limit per model picked from its size
+#   gap: relative gap at which CBC stops, 0 to prove optimality, or "auto"
+#   threads: CBC threads (None leaves it to CBC)
+DEFAULT_LIMITS = {
+    "time_limit": os.environ.get('SOLVER_TIME_LIMIT', 'auto'),
+    "gap": os.environ.get('SOLVER_GAP', 'auto'),
+    "threads": os.environ.get('SOLVER_THREADS'),
+}
 
-def optimize_streaming_packages(packages, games, game_dates, C_month, C_year, P_g):
+# Limits picked by "auto" from the model size (variables * constraints):
+# (largest size, time limit in seconds or None, relative gap or None)
+ADAPTIVE_LIMITS = [
+    (5e7, None, None),
+    (5e8, 60, 0.001),
+    (float('inf'), 120, 0.01),
+]
+
+
+def get_solver_pool():
     """
-    Optimizes the streaming package selection with rolling monthly and yearly subscriptions.
+    Returns the process pool for solving independent components, creating it on first use.
+
+    The workers are started by a fork server (or spawned where there is none): forking the
+    threaded web server could copy a lock that another thread holds into a worker.
+    """
+    global _solver_pool
+    if _solver_pool is None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # Workers are forked from a server that has imported the optimizer once
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        _solver_pool = ProcessPoolExecutor(max_workers=SOLVER_PROCESSES, mp_context=context)
+    return _solver_pool
+
+
+def check_limits(limits):
+    """
+    Validates solver limits (see `DEFAULT_LIMITS`) and converts them to numbers.
+
+    Parameters:
+        limits (dict): "time_limit", "gap" and "threads"; missing or None values are left out.
+
+    Returns:
+        dict: The given limits as numbers (or "auto").
+
+    Raises:
+        ValueError: If a limit is not a non-negative number, "auto" or (for threads) a positive integer.
+    """
+    checked = {}
+    for name in ("time_limit", "gap"):
+        value = limits.get(name)
+        if value is None:
+            continue
+        if value == "auto":
+            checked[name] = value
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = -1
+        if isinstance(value, bool) or not number >= 0:
+            raise ValueError(f"Invalid {name} '{value}'. Use a non-negative number or 'auto'.")
+        checked[name] = number
+    threads = limits.get("threads")
+    if threads is not None:
+        if isinstance(threads, bool) or not str(threads).isdigit() or int(threads) < 1:
+            raise ValueError(f"Invalid threads '{threads}'. Use a positive integer.")
+        checked["threads"] = int(threads)
+    return checked
+
+
+# Checked once at import, so a bad environment variable stops the server instead of failing every request
+try:
+    SERVER_LIMITS = check_limits(DEFAULT_LIMITS)
+except ValueError as e:
+    raise ValueError(f"Invalid SOLVER_TIME_LIMIT, SOLVER_GAP or SOLVER_THREADS: {e}") from e
+
+
+def request_deadline(limits=None, start=None):
+    """
+    Turns a time limit in seconds into the deadline of an optimization.
+
+    A numeric time limit bounds the whole optimization, not every model: the components share the
+    time that is left until the deadline (see `solve_model`). "auto" limits every model by its size.
+
+    Parameters:
+        limits (dict, optional): Request limits (see `DEFAULT_LIMITS`).
+        start (float, optional): time.time() when the optimization started, defaults to now.
+
+    Returns:
+        float: The deadline as time.time() value, or None without a numeric time limit.
+    """
+    time_limit = {**SERVER_LIMITS, **check_limits(limits or {})}.get("time_limit", "auto")
+    if time_limit == "auto" or not time_limit:
+        return None
+    return (time.time() if start is None else start) + time_limit
+
+
+def out_of_time(deadline):
+    """
+    Returns whether the deadline of an optimization (see `request_deadline`) has passed.
+    """
+    return deadline is not None and time.time() >= deadline
+
+
+def solver_limits(n_variables, n_constraints, limits=None, deadline=None):
+    """
+    Resolves the CBC limits for one model: request limits first, then the server-wide ones, and
+    "auto" picks them from the model size (see `ADAPTIVE_LIMITS`). With a deadline, CBC gets the
+    time that is left until it (at least a second) instead of a numeric time limit.
+
+    Returns:
+        dict: PULP_CBC_CMD options ("timeLimit", "gapRel", "threads") for the limits that are set.
+    """
+    settings = {**SERVER_LIMITS, **check_limits(limits or {})}
+    size = n_variables * n_constraints
+    auto_time_limit, auto_gap = next((t, g) for max_size, t, g in ADAPTIVE_LIMITS if size <= max_size)
+
+    time_limit = settings.get("time_limit", "auto")
+    time_limit = auto_time_limit if time_limit == "auto" else time_limit
+    gap = settings.get("gap", "auto")
+    gap = auto_gap if gap == "auto" else gap
+    if deadline is not None:
+        remaining = max(deadline - time.time(), 1)
+        time_limit = min(time_limit, remaining) if time_limit else remaining
+
+    options = {}
+    if time_limit:
+        options["timeLimit"] = time_limit
+    if gap:
+        options["gapRel"] = gap
+    if settings.get("threads"):
+        options["threads"] = settings["threads"]
+    return options
+
+
+def time_segments(games, game_dates, window):
+    """
+    Splits the games into segments that no subscription can connect.
+
+    If two consecutive games (by date) are more than `window` apart, no subscription covers games
+    on both sides of the gap, so the model falls apart into independent models, e.g. one per season.
 
     Parameters:
-        packages (list): List of package IDs.
         games (list): List of game IDs.
-        game_dates (dict): Dictionary mapping game IDs to datetime objects of their start dates.
-        C_month (dict): Dictionary of monthly subscription costs for each package.
-        C_year (dict): Dictionary of yearly subscription costs for each package.
-        P_g (dict): Dictionary mapping game IDs to a list of packages that can cover each game.
+        game_dates (dict): Dictionary mapping game IDs to their start dates.
+        window (timedelta): Longest subscription window in the model.
+
+    Returns:
+        list: Lists of game IDs, one per segment, in chronological order.
+    """
+    ordered = sorted(games, key=lambda g: game_dates[g])
+    segments = []
+    for g in ordered:
+        if not segments or game_dates[g] - game_dates[segments[-1][-1]] > window:
+            segments.append([])
+        segments[-1].append(g)
+    return segments
+
+
+def choose_granularity(packages, game_dates):
+    """
+    Picks the time granularity for granularity="auto" based on the size of the query.
+
+    Parameters:
+        packages (list): List of package IDs.
+        game_dates (dict): Dictionary mapping game IDs to their start dates.
+
+    Returns:
+        str: "day", "week" or "month".
+    """
+    size = len(packages) * len(set(game_dates.values()))
+    if size <= AUTO_DAY_LIMIT:
+        return "day"
+    if size <= AUTO_WEEK_LIMIT:
+        return "week"
+    return "month"
+
+
+def bucket_start_dates(game_dates, granularity):
+    """
+    Aggregates the possible subscription start dates into buckets.
+
+    The sorted game dates are cut greedily into buckets whose span does not exceed the span of
+    the granularity. Only the first date of every bucket remains a possible start date. Since
+    every span is at most one subscription month, each game can still be covered.
+
+    Parameters:
+        game_dates (dict): Dictionary mapping game IDs to their start dates.
+        granularity (str): "day", "week" or "month".
+
+    Returns:
+        list: Sorted list of possible subscription start dates.
+    """
+    dates = sorted(set(game_dates.values()))
+    span = GRANULARITY_SPANS[granularity]
+    if span == timedelta(0):
+        return dates
+
+    start_dates = []
+    for d in dates:
+        if not start_dates or d > start_dates[-1] + span:
+            start_dates.append(d)
+    return start_dates
+
+
+def coverage_windows(start_dates, game_times, window):
+    """
+    Finds, for every game, the range of start dates whose subscription window covers it.
+
+    A subscription started at d covers a game at t if d <= t <= d + window, i.e. d lies in
+    [t - window, t]. Because `start_dates` is sorted this is two binary searches per game.
+
+    Parameters:
+        start_dates (np.ndarray): Sorted datetime64 array of possible subscription start dates.
+        game_times (np.ndarray): datetime64 array with the start time of every game.
+        window (timedelta): Length of the subscription.
+
+    Returns:
+        tuple: Two integer arrays (lo, hi); game i is covered by the start dates start_dates[lo[i]:hi[i]].
+    """
+    window = np.timedelta64(window)
+    lo = np.searchsorted(start_dates, game_times - window, side='left')
+    hi = np.searchsorted(start_dates, game_times, side='right')
+    return lo, hi
+
+
+def coverage_entries(game_idx, package_idx, lo, hi):
+    """
+    Expands (game, package) incidences into (game, package, start date) entries of the constraint matrix.
+
+    Parameters:
+        game_idx (np.ndarray): Row (game) index of every (game, package) incidence.
+        package_idx (np.ndarray): Package index of every (game, package) incidence.
+        lo (np.ndarray): First covering start date index per game (see `coverage_windows`).
+        hi (np.ndarray): End (exclusive) of the covering start date range per game.
+
+    Returns:
+        tuple: Three integer arrays (rows, packages, start date indices) of equal length.
+    """
+    counts = hi[game_idx] - lo[game_idx]
+    total = int(counts.sum())
+    rows = np.repeat(game_idx, counts)
+    cols_p = np.repeat(package_idx, counts)
+    # Offset of each entry inside its own [lo, hi) range
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols_d = np.repeat(lo[game_idx], counts) + offsets
+    return rows, cols_p, cols_d
+
+
+def coverage_matrix(packages, games, game_dates, C_month, C_year, P_g, start_dates=None, allowed_starts=None):
+    """
+    Computes the columns (subscriptions) and the game coverage matrix of the model.
+
+    The coverage windows are found with binary searches on the sorted start dates and the whole
+    matrix is assembled in one batched NumPy pass. Only columns that cover at least one game are
+    returned; all other subscriptions would be 0 in every optimal solution anyway.
+
+    Parameters:
+        See `optimize_streaming_packages`.
+        start_dates (list, optional): Sorted list of possible subscription start dates.
+            Defaults to every distinct game date (see `bucket_start_dates`).
+        allowed_starts (dict, optional): Restricts the start dates per subscription type and package,
+            e.g. {"month": {p: [d, ...]}, "year": {...}} (see `presolve.presolve`). Packages missing
+            from a type get no columns of that type. Defaults to all start dates for all packages.
 
     Returns:
-        dict: Optimization results, including total cost and active subscriptions.
+        dict: A dictionary containing:
+            - "columns" (list): (subscription type, package, start date) of every column.
+            - "costs" (np.ndarray): Adjusted cost of every column (price + activation cost).
+            - "rows" (np.ndarray): Game index (into `games`) of every matrix entry, sorted.
+            - "cols" (np.ndarray): Column index of every matrix entry.
+            - "start_dates" (list): Sorted list of possible subscription start dates.
     """
     # Filter out unavailable subscriptions
     filtered_C_month = {p: C_month[p] for p in C_month if p in packages}
@@ -196,56 +419,589 @@ def optimize_streaming_packages(packages, games, game_dates, C_month, C_year, P_
     adjusted_C_year = {p: cost + 12 for p, cost in filtered_C_year.items()}
 
     # Generate possible start dates for rolling subscriptions
-    start_dates = sorted(set(game_dates.values()))
+    if start_dates is None:
+        start_dates = bucket_start_dates(game_dates, "day")
+    start_times = np.array(start_dates, dtype='datetime64[s]')
+    game_times = np.array([game_dates[g] for g in games], dtype='datetime64[s]')
+
+    columns = []
+    costs = []
+    entry_rows = []
+    entry_cols = []
+
+    # Which priced package streams which game, once for both subscription types
+    priced = list(dict.fromkeys([*adjusted_C_month, *adjusted_C_year]))
+    priced_pos = {p: i for i, p in enumerate(priced)}
+    incidence = incidence_matrix(games, priced, P_g)
+
+    def add_subscription_type(name, adjusted_C, window):
+        if allowed_starts is not None:
+            adjusted_C = {p: cost for p, cost in adjusted_C.items() if p in allowed_starts[name]}
+
+        # (game, package) incidences for packages that offer this subscription type
+        package_list = list(adjusted_C)
+        game_idx, package_idx = np.nonzero(incidence[:, [priced_pos[p] for p in package_list]])
+
+        lo, hi = coverage_windows(start_times, game_times, window)
+        rows, cols_p, cols_d = coverage_entries(game_idx, package_idx, lo, hi)
+
+        if allowed_starts is not None:
+            # Drop the matrix entries of start dates that are not allowed for their package
+            date_pos = {d: i for i, d in enumerate(start_dates)}
+            allowed = np.zeros((len(package_list), len(start_dates)), dtype=bool)
+            for i, p in enumerate(package_list):
+                allowed[i, [date_pos[d] for d in allowed_starts[name][p]]] = True
+            keep = allowed[cols_p, cols_d]
+            rows, cols_p, cols_d = rows[keep], cols_p[keep], cols_d[keep]
+
+        # One column per distinct (package, start date)
+        unique_cols, cols = np.unique(cols_p * len(start_dates) + cols_d, return_inverse=True)
+        entry_rows.append(rows)
+        entry_cols.append(cols.reshape(-1) + len(columns))
+        for col in unique_cols.tolist():
+            p = package_list[col // len(start_dates)]
+            columns.append((name, p, start_dates[col % len(start_dates)]))
+            costs.append(adjusted_C[p])
+
+    add_subscription_type("month", adjusted_C_month, MONTH_WINDOW)
+    add_subscription_type("year", adjusted_C_year, YEAR_WINDOW)
+
+    # Sort all matrix entries by game once
+    rows = np.concatenate(entry_rows)
+    cols = np.concatenate(entry_cols)
+    order = np.argsort(rows, kind='stable')
+
+    return {
+        "columns": columns,
+        "costs": np.array(costs, dtype=float),
+        "rows": rows[order],
+        "cols": cols[order],
+        "start_dates": start_dates,
+    }
+
+
+def preferred_entries(matrix, games, preferred_P_g):
+    """
+    Marks the coverage matrix entries whose package streams the game with a preferred quality.
 
-    # Compute coverage windows for rolling monthly and yearly subscriptions
-    coverage_month = {d: [g for g, gd in game_dates.items() if d <= gd <= d + timedelta(days=30)] for d in start_dates}
-    coverage_year = {d: [g for g, gd in game_dates.items() if d <= gd <= d + timedelta(days=365)] for d in start_dates}
+    Parameters:
+        matrix (dict): Coverage matrix (see `coverage_matrix`).
+        games (list): The games (rows) of the matrix.
+        preferred_P_g (dict): Maps game IDs to the packages that stream them with the preferred quality.
+
+    Returns:
+        np.ndarray: Boolean mask over the matrix entries.
+    """
+    package_pos = {}
+    col_package = np.array([package_pos.setdefault(p, len(package_pos)) for _, p, _ in matrix["columns"]],
+                           dtype=np.int64)
+    if not len(col_package):
+        return np.zeros(len(matrix["rows"]), dtype=bool)
+    preferred = incidence_matrix(games, list(package_pos), preferred_P_g)
+    return preferred[matrix["rows"], col_package[matrix["cols"]]]
+
+
+def missed_preferences(matrix, preferred, selected, n_games):
+    """
+    Returns, for a selection of columns, the games that some column could cover with the preferred
+    quality but no selected column does (boolean mask over the games).
+    """
+    chosen = np.zeros(len(matrix["columns"]), dtype=bool)
+    chosen[list(selected)] = True
+    possible = np.zeros(n_games, dtype=bool)
+    possible[matrix["rows"][preferred]] = True
+    covered = np.zeros(n_games, dtype=bool)
+    covered[matrix["rows"][preferred & chosen[matrix["cols"]]]] = True
+    return possible & ~covered
+
+
+def selection_objective(built, selected, n_games):
+    """
+    Returns the objective value of a selection of columns in a built model (see `build_model`):
+    the adjusted costs plus the penalties of the games that miss a preferred quality.
+    """
+    objective = float(built["matrix"]["costs"][selected].sum())
+    for weight, preferred, _ in built["preferences"]:
+        objective += weight * int(missed_preferences(built["matrix"], preferred, selected, n_games).sum())
+    return objective
+
+
+def heuristic_selection(built, n_games):
+    """
+    Finds a good solution of a built model with the set cover heuristic (see `heuristic.py`).
+
+    The heuristic only knows costs, so with preferences it also covers every game with the entries
+    that have all preferred qualities the game can get, and the cheaper of both covers (by
+    `selection_objective`) is returned.
+
+    Returns:
+        list: Indices of the selected columns, or None if some game can't be covered.
+    """
+    matrix = built["matrix"]
+    selected = heuristic_solution(matrix, n_games)
+    if selected is None or not built["preferences"]:
+        return selected
+
+    # Restrict every game to its best entries
+    best = np.ones(len(matrix["rows"]), dtype=bool)
+    for _, preferred, _ in built["preferences"]:
+        has_preferred = np.zeros(n_games, dtype=bool)
+        has_preferred[matrix["rows"][best & preferred]] = True
+        best &= preferred | ~has_preferred[matrix["rows"]]
+    preferring = heuristic_solution({**matrix, "rows": matrix["rows"][best], "cols": matrix["cols"][best]}, n_games)
+    if preferring is not None and \
+            selection_objective(built, preferring, n_games) < selection_objective(built, selected, n_games):
+        return preferring
+    return selected
+
+
+def complete_selection(built, columns, n_games):
+    """
+    Turns a set of subscriptions, e.g. the solution of a similar earlier query, into a solution of
+    a built model: the columns among them are kept and the games they leave uncovered are covered
+    with the set cover heuristic.
+
+    Parameters:
+        built (dict): The built model (see `build_model`).
+        columns (set): (subscription type, package, start date) tuples.
+        n_games (int): Number of games of the model.
+
+    Returns:
+        list: Indices of the selected columns, or None if some game can't be covered.
+    """
+    matrix = built["matrix"]
+    selected = [c for c, column in enumerate(matrix["columns"]) if column in columns]
+    chosen = np.zeros(len(matrix["columns"]), dtype=bool)
+    chosen[selected] = True
+    covered = np.zeros(n_games, dtype=bool)
+    covered[matrix["rows"][chosen[matrix["cols"]]]] = True
+    if covered.all():
+        return selected
+
+    # Cover the rest on the matrix of the uncovered games, renumbered to 0..k-1
+    uncovered = np.flatnonzero(~covered)
+    renumber = np.full(n_games, -1, dtype=np.int64)
+    renumber[uncovered] = np.arange(len(uncovered))
+    keep = ~covered[matrix["rows"]]
+    rest = heuristic_solution({**matrix, "rows": renumber[matrix["rows"][keep]], "cols": matrix["cols"][keep]},
+                              len(uncovered))
+    if rest is None:
+        return None
+    return selected + rest
+
+
+def build_model(packages, games, game_dates, C_month, C_year, P_g, start_dates=None, allowed_starts=None,
+                preferences=None, monitor=None):
+    """
+    Builds the MIP for the streaming package optimization.
+
+    Every preference adds a continuous variable u_g per game that some package streams with the
+    preferred quality: u_g >= 1 - (selected subscriptions that stream g with that quality), and
+    u_g costs the preference weight. Games that no package streams with the quality would pay the
+    same penalty in every solution, and games that every package streams with it never pay it, so
+    neither gets a variable.
+
+    Parameters:
+        See `coverage_matrix`.
+        preferences (dict, optional): Live and highlight preferences (see `preprocess_data`).
+        monitor (progress.SolveMonitor, optional): Checked for every constraint, so a cancelled
+            optimization stops during the build.
+
+    Returns:
+        dict: A dictionary containing:
+            - "model" (pulp.LpProblem): The model, ready to be solved.
+            - "z_month" (dict): Maps (package, start date) to the binary monthly subscription variable.
+            - "z_year" (dict): Maps (package, start date) to the binary yearly subscription variable.
+            - "variables" (list): The variables in the column order of the coverage matrix.
+            - "matrix" (dict): The coverage matrix (see `coverage_matrix`).
+            - "preferences" (list): (weight, preferred entry mask, {game index: u variable}) per preference.
+    """
+    matrix = coverage_matrix(packages, games, game_dates, C_month, C_year, P_g, start_dates, allowed_starts)
 
     # Model
     model = pulp.LpProblem("Streaming_Package_Optimization", pulp.LpMinimize)
 
     # Decision variables
-    z_month = {(p, d): pulp.LpVariable(f"z_month_{p}_{d.strftime('%Y-%m-%d')}", cat='Binary')
-               for p in adjusted_C_month for d in start_dates}
-    z_year = {(p, d): pulp.LpVariable(f"z_year_{p}_{d.strftime('%Y-%m-%d')}", cat='Binary')
-              for p in adjusted_C_year for d in start_dates}
-
-    # Objective function: Minimize total cost (with adjusted costs)
-    model += pulp.lpSum(adjusted_C_month[p] * z_month[p, d] for p in adjusted_C_month for d in start_dates) + \
-             pulp.lpSum(adjusted_C_year[p] * z_year[p, d] for p in adjusted_C_year for d in start_dates)
+    z = {"month": {}, "year": {}}
+    variables = []
+    for name, p, d in matrix["columns"]:
+        var = pulp.LpVariable(f"z_{name}_{p}_{d.strftime('%Y-%m-%d')}", cat='Binary')
+        z[name][p, d] = var
+        variables.append(var)
+
+    # Preference variables: u_g is 1 if game g misses the preferred quality
+    model_preferences = []
+    objective = list(zip(variables, matrix["costs"].tolist()))
+    for name, preference in sorted((preferences or {}).items()):
+        preferred = preferred_entries(matrix, games, preference["P_g"])
+        missed = {}
+        mixed = np.intersect1d(matrix["rows"][preferred], matrix["rows"][~preferred])
+        for r in mixed.tolist():
+            missed[r] = pulp.LpVariable(f"u_{name}_{r}", lowBound=0, upBound=1)
+            objective.append((missed[r], preference["weight"]))
+        model_preferences.append((preference["weight"], preferred, missed))
+
+    # Objective function: Minimize total cost (with adjusted costs) plus the preference penalties
+    model += pulp.LpAffineExpression(objective)
 
     # Constraints
-    # 1. Game coverage
-    for g in games:
-        model += pulp.lpSum(z_month[p, d] for p in P_g[g] if p in adjusted_C_month for d in start_dates if g in coverage_month[d]) + \
-                 pulp.lpSum(z_year[p, d] for p in P_g[g] if p in adjusted_C_year for d in start_dates if g in coverage_year[d]) >= 1
+    # 1. Game coverage: cut the sorted matrix entries into one row per game
+    var_array = np.empty(len(variables), dtype=object)
+    var_array[:] = variables
+    row_vars = var_array[matrix["cols"]]
+    bounds = np.searchsorted(matrix["rows"], np.arange(len(games) + 1))
+    for r in range(len(games)):
+        if monitor is not None:
+            monitor.check()
+        row = dict.fromkeys(row_vars[bounds[r]:bounds[r + 1]].tolist(), 1)
+        model += pulp.LpConstraint(pulp.LpAffineExpression(row), sense=pulp.LpConstraintGE, rhs=1)
+
+    # 2. Preferences: the subscriptions that stream the game with the quality, or the penalty
+    for _, preferred, missed in model_preferences:
+        preferred_rows = matrix["rows"][preferred]
+        preferred_vars = row_vars[preferred]
+        preferred_bounds = np.searchsorted(preferred_rows, np.arange(len(games) + 1))
+        for r, u in missed.items():
+            if monitor is not None:
+                monitor.check()
+            row = dict.fromkeys(preferred_vars[preferred_bounds[r]:preferred_bounds[r + 1]].tolist(), 1)
+            row[u] = 1
+            model += pulp.LpConstraint(pulp.LpAffineExpression(row), sense=pulp.LpConstraintGE, rhs=1)
+
+    return {
+        "model": model,
+        "z_month": z["month"],
+        "z_year": z["year"],
+        "variables": variables,
+        "matrix": matrix,
+        "preferences": model_preferences,
+    }
 
-    # Solve the model
-    status = model.solve(pulp.PULP_CBC_CMD())
 
-    # Process results
-    # Calculate the actual total cost (subtract the added cost of 1 per package activation)
-    #actual_total_cost = pulp.value(model.objective) - sum(len(start_dates) for p in adjusted_C_month) - sum(len(start_dates) for p in adjusted_C_year)
+def deadline_result(built, n_games, solver, initial, statistics):
+    """
+    Answers a model without time left before the deadline of its optimization (see
+    `request_deadline`): the completed earlier solution or the heuristic solution, without a bound.
+    """
+    solve_start = time.perf_counter()
+    selected = None
+    if solver == "mip" and initial:
+        selected = complete_selection(built, initial, n_games)
+    if selected is None:
+        selected = heuristic_selection(built, n_games)
+    statistics["solve_seconds"] = time.perf_counter() - solve_start
+    if selected is None:
+        return {"status": "Infeasible", "active_monthly_subscriptions": [], "active_yearly_subscriptions": [],
+                "objective": None, "lower_bound": None, "statistics": statistics}
+    active = [built["matrix"]["columns"][c] for c in selected]
+    return {
+        "status": "Heuristic" if solver == "greedy" else "Feasible",
+        "active_monthly_subscriptions": [{"package": p, "start_date": d} for t, p, d in active if t == "month"],
+        "active_yearly_subscriptions": [{"package": p, "start_date": d} for t, p, d in active if t == "year"],
+        "objective": selection_objective(built, selected, n_games),
+        "lower_bound": None,
+        "statistics": statistics,
+    }
 
-    results = {
-        "status": pulp.LpStatus[status],
-     #   "total_cost": actual_total_cost, # remove because not needed
-        "active_monthly_subscriptions": [],
-        "active_yearly_subscriptions": []
+
+def solve_model(packages, games, game_dates, C_month, C_year, P_g, start_dates, allowed_starts=None,
+                solver="mip", warm_start=False, monitor=None, limits=None, preferences=None, initial=None,
+                deadline=None):
+    """
+    Builds and solves the model for one set of games.
+
+    The deadline is checked before the model is built and before it is solved: without time left,
+    the games are covered by `deadline_result` (before the build on the coverage matrix alone).
+
+    Parameters:
+        See `optimize_streaming_packages` and `build_model`.
+        initial (set, optional): For solver="mip", subscriptions ((type, package, start date)
+            tuples) to start CBC from, completed to a cover with `complete_selection`.
+        deadline (float, optional): time.time() by which the optimization must end (see `request_deadline`).
+
+    Returns:
+        dict: A dictionary containing:
+            - "status" (str): Solver status ("Heuristic" for a greedy solution, "Feasible" if CBC
+              stopped at a limit before proving optimality).
+            - "active_monthly_subscriptions" (list): Monthly subscriptions ("package", "start_date").
+            - "active_yearly_subscriptions" (list): Yearly subscriptions ("package", "start_date").
+            - "objective" (float): Objective value (with adjusted costs and preference penalties) of
+              the solution, or None.
+            - "lower_bound" (float): Lower bound on the optimal objective value, or None.
+            - "statistics" (dict): Size of the model, build and solve time and the branch and bound
+              nodes (None for the greedy solver).
+    """
+    build_start = time.perf_counter()
+    if out_of_time(deadline):
+        matrix = coverage_matrix(packages, games, game_dates, C_month, C_year, P_g, start_dates, allowed_starts)
+        built = {"matrix": matrix, "preferences": [
+            (preference["weight"], preferred_entries(matrix, games, preference["P_g"]), {})
+            for _, preference in sorted((preferences or {}).items())
+        ]}
+        statistics = {"variables": 0, "constraints": 0, "nonzeros": 0, "build_seconds": time.perf_counter() - build_start,
+                      "solve_seconds": 0.0, "nodes": None}
+        return deadline_result(built, len(games), solver, initial, statistics)
+    with span("build_model", games=len(games)):
+        built = build_model(packages, games, game_dates, C_month, C_year, P_g,
+                            start_dates=start_dates, allowed_starts=allowed_starts, preferences=preferences,
+                            monitor=monitor)
+    if monitor is not None:
+        monitor.check()
+    model = built["model"]
+    variables = built["variables"]
+    matrix = built["matrix"]
+    options = solver_limits(len(variables), model.numConstraints(), limits, deadline)
+    statistics = {
+        "variables": len(variables) + sum(len(missed) for _, _, missed in built["preferences"]),
+        "constraints": model.numConstraints(),
+        "nonzeros": int(len(matrix["rows"]) + sum(preferred.sum() + len(missed) for _, preferred, missed in built["preferences"])),
+        "build_seconds": time.perf_counter() - build_start,
+        "solve_seconds": 0.0,
+        "nodes": None,
+    }
+    if out_of_time(deadline):
+        return deadline_result(built, len(games), solver, initial, statistics)
+    solve_start = time.perf_counter()
+
+    selected = None
+    if solver == "mip" and initial:
+        selected = complete_selection(built, initial, len(games))
+    if selected is None and (solver == "greedy" or warm_start):
+        selected = heuristic_selection(built, len(games))
+
+    if solver == "greedy":
+        if selected is None:
+            return {"status": "Infeasible", "active_monthly_subscriptions": [], "active_yearly_subscriptions": [],
+                    "objective": None, "lower_bound": None, "statistics": statistics}
+        status = "Heuristic"
+        objective = selection_objective(built, selected, len(games))
+        active = [matrix["columns"][c] for c in selected]
+
+        # The LP relaxation bounds how far the heuristic solution can be from the optimum
+        for var in variables:
+            var.cat = pulp.LpContinuous
+        with span("cbc", relaxation=True):
+            lp_status = model.solve(cbc_solver(monitor, timeLimit=options.get("timeLimit"), threads=options.get("threads")))
+        lower_bound = (pulp.value(model.objective) or 0) if pulp.LpStatus[lp_status] == "Optimal" else None
+    else:
+        if selected is not None:
+            for var in variables:
+                var.setInitialValue(0)
+            for c in selected:
+                variables[c].setInitialValue(1)
+            for _, preferred, missed in built["preferences"]:
+                missed_games = missed_preferences(matrix, preferred, selected, len(games))
+                for r, u in missed.items():
+                    u.setInitialValue(int(missed_games[r]))
+
+        # Solve the model
+        cbc = cbc_solver(monitor, warmStart=selected is not None, **options)
+        with span("cbc", variables=statistics["variables"], constraints=statistics["constraints"]) as entry:
+            status = pulp.LpStatus[model.solve(cbc)]
+            if entry is not None:
+                entry["nodes"] = cbc.nodes
+        statistics["nodes"] = cbc.nodes
+        active = [column for column, var in zip(matrix["columns"], variables)
+                  if var.varValue is not None and var.varValue > 0]
+        objective = (pulp.value(model.objective) or 0) if status == "Optimal" else None
+        lower_bound = objective
+        # PuLP reports "Optimal" for the best solution found at a limit as well: keep CBC's bound
+        if objective is not None and cbc.bound is not None and objective - cbc.bound > BOUND_TOLERANCE * max(1, abs(objective)):
+            status = "Feasible"
+            lower_bound = cbc.bound
+        elif objective is not None and model.sol_status == pulp.LpSolutionIntegerFeasible:
+            status = "Feasible"
+            lower_bound = None
+        elif status == "Not Solved" and "timeLimit" in options:
+            # No solution within the time limit: fall back to the greedy solution
+            if selected is None:
+                selected = heuristic_selection(built, len(games))
+            if selected is not None:
+                objective = selection_objective(built, selected, len(games))
+                active = [matrix["columns"][c] for c in selected]
+                lower_bound = cbc.bound
+                proven = lower_bound is not None and objective - lower_bound <= BOUND_TOLERANCE * max(1, abs(objective))
+                status = "Optimal" if proven else "Feasible"
+    statistics["solve_seconds"] = time.perf_counter() - solve_start
+
+    return {
+        "status": status,
+        "active_monthly_subscriptions": [{"package": p, "start_date": d} for t, p, d in active if t == "month"],
+        "active_yearly_subscriptions": [{"package": p, "start_date": d} for t, p, d in active if t == "year"],
+        "objective": objective,
+        "lower_bound": lower_bound,
+        "statistics": statistics,
     }
 
-    for p in adjusted_C_month:
-        for d in start_dates:
-            if z_month[p, d].varValue is not None and z_month[p, d].varValue > 0:
-                results["active_monthly_subscriptions"].append({"package": p, "start_date": d})
-    for p in adjusted_C_year:
-        for d in start_dates:
-            if z_year[p, d].varValue is not None and z_year[p, d].varValue > 0:
-                results["active_yearly_subscriptions"].append({"package": p, "start_date": d})
 
-    return results
+def component_key(component, game_dates, start_dates, packages, C_month, C_year, P_g, preferences=None):
+    """
+    Identifies the model of a component of games (see `optimize_streaming_packages`).
+
+    The optimal solution of a component only depends on its games with their dates, the packages
+    that stream them with their prices, the preferences of these games and the start dates that
+    can cover them, i.e. the ones from a year before its first game to its last game. Other games
+    of the query and the presolve reductions (which keep the optimal cost) don't change it.
 
+    Returns:
+        tuple: The sorted games with their dates and packages, the prices of their packages, the
+        preference weights with the preferred packages of the games and the start dates in range.
+    """
+    component = sorted(component)
+    dates = [game_dates[g] for g in component]
+    lo = bisect.bisect_left(start_dates, min(dates) - YEAR_WINDOW)
+    hi = bisect.bisect_right(start_dates, max(dates))
+    game_packages = [tuple(sorted(P_g[g])) for g in component]
+    used = sorted(p for p in set().union(*game_packages) if p in packages)
+    prices = tuple((p, C_month.get(p), C_year.get(p)) for p in used)
+    preference_keys = tuple(
+        (name, preference["weight"], tuple(tuple(sorted(preference["P_g"].get(g, ()))) for g in component))
+        for name, preference in sorted((preferences or {}).items())
+    )
+    return (tuple(zip(component, dates, game_packages)), prices, preference_keys, tuple(start_dates[lo:hi]))
+
+
+def optimality_gap(objective, lower_bound):
+    """
+    Returns the relative gap (objective - lower_bound) / lower_bound, or None if it is unknown.
+    """
+    if objective is None or lower_bound is None:
+        return None
+    if objective - lower_bound <= 1e-9:
+        return 0.0
+    if lower_bound <= 0:
+        return None
+    return (objective - lower_bound) / lower_bound
+
+
+def optimize_streaming_packages(packages, games, game_dates, C_month, C_year, P_g, granularity="day",
+                                allowed_starts=None, components=None, solver="mip", warm_start=False, monitor=None,
+                                limits=None, preferences=None, initial=None, component_cache=None, deadline=None):
+    """
+    Optimizes the streaming package selection with rolling monthly and yearly subscriptions.
+
+    With a coarser granularity than "day", subscriptions can only start at the beginning of a
+    bucket of game dates. This shrinks the model a lot for large queries, but the result can be
+    more expensive than the optimal daily solution.
+
+    Parameters:
+        packages (list): List of package IDs.
+        games (list): List of game IDs.
+        game_dates (dict): Dictionary mapping game IDs to datetime objects of their start dates.
+        C_month (dict): Dictionary of monthly subscription costs for each package.
+        C_year (dict): Dictionary of yearly subscription costs for each package.
+        P_g (dict): Dictionary mapping game IDs to a list of packages that can cover each game.
+        granularity (str): Time granularity of the subscription start dates: "day", "week", "month"
+            or "auto" (picked by query size, see `choose_granularity`).
+        allowed_starts (dict, optional): Allowed start dates per subscription type and package (see `build_model`).
+        components (list, optional): Partition of `games` into independent lists of games. Every
+            component is solved as its own model, large ones in parallel in a process pool.
+            Defaults to the time segments of the games (see `time_segments`).
+        solver (str): "mip" solves the model with CBC, "greedy" uses the set cover heuristic with
+            local search (see `heuristic.py`), which is much faster but not always optimal.
+        warm_start (bool): For solver="mip", start CBC from the heuristic solution.
+        monitor (progress.SolveMonitor, optional): Receives the CBC progress and can cancel the
+            optimization. Monitored optimizations solve all components in this process.
+        limits (dict, optional): CBC limits ("time_limit", "gap", "threads"), see `DEFAULT_LIMITS`.
+            A model that hits a limit returns its best solution with status "Feasible" and the
+            bound CBC proved.
+        preferences (dict, optional): Live and highlight preferences (see `preprocess_data`); games
+            that no selected subscription streams with a preferred quality add its weight to the objective.
+        initial (set, optional): Subscriptions ((type, package, start date) tuples) of an earlier
+            solution to warm start CBC from (see `solve_model`).
+        component_cache (optional): Store of optimal component results with `get(key)` and
+            `put(key, result)` (see `session.ComponentResults`), keyed by `component_key`. Only optimal
+            results are stored, so optimizations with different solvers or limits can share it.
+        deadline (float, optional): time.time() by which all components must be solved. Defaults
+            to the numeric time limit from now (see `request_deadline`).
 
+    Returns:
+        dict: Optimization results, including the used granularity, active subscriptions, the objective
+        value, a lower bound (LP relaxation for "greedy"), the relative optimality gap and the summed
+        model "statistics" (see `solve_model`; "reused" counts the components taken from the cache).
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Use one of: {', '.join(SOLVERS)}.")
+    if granularity == "auto":
+        granularity = choose_granularity(packages, game_dates)
+    if granularity not in GRANULARITY_SPANS:
+        raise ValueError(f"Unknown granularity '{granularity}'. Use one of: auto, {', '.join(GRANULARITY_SPANS)}.")
+    check_limits(limits or {})
+    if deadline is None:
+        deadline = request_deadline(limits)
+
+    start_dates = bucket_start_dates(game_dates, granularity)
+    if components is None:
+        window = YEAR_WINDOW if any(p in packages for p in C_year) else MONTH_WINDOW
+        components = time_segments(games, game_dates, window)
 
+    # Process results
+    results = {
+        "status": "Optimal",
+        "granularity": granularity,
+        # The bucketed model equals the daily model if no two game dates share a bucket
+        "same_as_daily": len(start_dates) == len(set(game_dates.values())),
+        "active_monthly_subscriptions": [],
+        "active_yearly_subscriptions": [],
+        "objective_value": 0.0,
+        "lower_bound": 0.0,
+        # Summed over the models of all components
+        "statistics": {"models": len(components), "variables": 0, "constraints": 0, "nonzeros": 0,
+                       "build_seconds": 0.0, "solve_seconds": 0.0, "nodes": 0, "reused": 0},
+    }
 
+    # Components solved optimally by an earlier optimization don't need to be solved again
+    solved = {}
+    keys = {}
+    if component_cache is not None:
+        for i, component in enumerate(components):
+            keys[i] = component_key(component, game_dates, start_dates, packages, C_month, C_year, P_g, preferences)
+            cached = component_cache.get(keys[i])
+            if cached is not None:
+                solved[i] = cached
+        results["statistics"]["reused"] = len(solved)
+
+    # Send the large components to the process pool (only worth it if there are at least two)
+    large = [i for i, component in enumerate(components) if len(component) >= PARALLEL_MIN_GAMES and i not in solved]
+    futures = {}
+    if SOLVER_PROCESSES > 1 and len(large) > 1 and monitor is None:
+        pool = get_solver_pool()
+        for i in large:
+            futures[i] = pool.submit(solve_model, packages, components[i], game_dates, C_month, C_year, P_g,
+                                     start_dates, allowed_starts, solver, warm_start, None, limits, preferences,
+                                     initial, deadline)
+
+    # Solve the rest here while the pool is busy, then merge in component order
+    reused = set(solved)
+    for i, component in enumerate(components):
+        if i not in futures and i not in solved:
+            if monitor is not None:
+                monitor.check()
+            solved[i] = solve_model(packages, component, game_dates, C_month, C_year, P_g, start_dates,
+                                    allowed_starts, solver, warm_start, monitor, limits, preferences, initial,
+                                    deadline)
+    for i, future in futures.items():
+        solved[i] = future.result()
+    for i, key in keys.items():
+        if i not in reused and solved[i]["status"] == "Optimal":
+            component_cache.put(key, solved[i])
+
+    for i in range(len(components)):
+        component = solved[i]
+        # The whole result is only as good as its worst component
+        if STATUS_RANK.get(component["status"], 2) > STATUS_RANK.get(results["status"], 2):
+            results["status"] = component["status"]
+        results["active_monthly_subscriptions"].extend(component["active_monthly_subscriptions"])
+        results["active_yearly_subscriptions"].extend(component["active_yearly_subscriptions"])
+        for key, value in (("objective_value", component["objective"]), ("lower_bound", component["lower_bound"])):
+            results[key] = None if results[key] is None or value is None else results[key] + value
+        if i in reused:
+            continue
+        for key, value in component["statistics"].items():
+            total = results["statistics"][key]
+            results["statistics"][key] = None if total is None or value is None else total + value
+
+    for key in ("build_seconds", "solve_seconds"):
+        results["statistics"][key] = round(results["statistics"][key], 4)
+    results["optimality_gap"] = optimality_gap(results["objective_value"], results["lower_bound"])
+    return results
@@ -0,0 +1,242 @@
+import contextvars
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Upper bounds of the histogram buckets for model sizes (variables, constraints, nodes)
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000, 10000000)
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """
+    Timing spans of one request.
+
+    Code anywhere down the call stack adds spans to the active trace with `span` and attributes
+    with `annotate`; without an active trace both do nothing. Spans carry their nesting depth, so
+    stages (depth 0) can be told apart from the steps inside them.
+    """
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.perf_counter()
+        self.finished = None
+        self.spans = []
+        self.attributes = {}
+        self._depth = 0
+
+    @contextmanager
+    def activate(self):
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+            self.finished = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        start = time.perf_counter()
+        entry = {"name": name, "depth": self._depth, "start_ms": round((start - self.started) * 1000, 3)}
+        self.spans.append(entry)
+        self._depth += 1
+        try:
+            yield entry
+        finally:
+            self._depth -= 1
+            entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            entry.update(attributes)
+
+    def duration(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def stages(self):
+        """
+        Returns the total seconds per top-level span name.
+        """
+        totals = {}
+        for entry in self.spans:
+            if entry["depth"] == 0 and "duration_ms" in entry:
+                totals[entry["name"]] = totals.get(entry["name"], 0) + entry["duration_ms"] / 1000
+        return totals
+
+    def info(self):
+        return {
+            "trace_id": self.id,
+            "total_ms": round(self.duration() * 1000, 3),
+            "spans": self.spans,
+            **self.attributes,
+        }
+
+    def server_timing(self):
+        """
+        Returns the stage durations as a Server-Timing header value.
+        """
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages().items())
+
+
+def current():
+    """
+    Returns the active trace, or None.
+    """
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a block as a span of the active trace (does nothing without one).
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attributes) as entry:
+        yield entry
+
+
+def annotate(**attributes):
+    """
+    Adds attributes (e.g. solver statistics) to the active trace.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Counters and histograms in the Prometheus text format.
+
+    The metrics live in the process: every worker of a multi-process server reports its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, help_text, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, help_text, value, buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for labels, value in sorted(self._counters[name].items()):
+                        lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                for labels, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + [math.inf], histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the calling thread from a background thread.
+
+    The result is a count per call stack in the collapsed format of flame graph tools
+    ("outer;inner;innermost"). The interval is a lower bound: the sampler needs the GIL, so busy
+    Python code is sampled less often.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """
+        Returns the samples in the collapsed stack format, one "stack count" line per stack.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def top(self, n=20):
+        """
+        Returns the functions that were running in most samples (self time).
+        """
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(self.samples.values())
+        return [{"function": function, "samples": count, "share": round(count / total, 4)}
+                for function, count in leaves.most_common(n)]